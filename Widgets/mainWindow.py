@@ -23,6 +23,7 @@ from ui.mainWindow import Ui_MainWindow
 from utils.customMenu import CustomMenuProvider
 from Widgets.custom_maptool import RectangleMapTool, PolygonMapTool, PointMapTool, LineMapTool
 from computation.morphology_single import calUCP
+from computation.pipeline import loadComputationConfig
 
 PROJECT = QgsProject.instance()
 
@@ -65,7 +66,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         #选择
         self.allIndicator = [
             self.count, self.sumhei, self.area, self.volume, self.mh, self.stdh, self.haw,
-            self.lb, self.lp, self.lf0, self.lf45, self.lf90, self.lf135, self.dh,
+            self.lb, self.lp, self.lf0, self.lf45, self.lf90, self.lf135, self.lfN, self.lfRose, self.dh,
             self.pol, self.lpi, self.pd, self.ed, self.si, self.ai]
         self.selectAll.clicked.connect(self.actionSelectAllTriggered)
         self.selectSwitch.clicked.connect(self.actionSelectSwitchTriggered)
@@ -255,6 +256,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     def actionCalMorTriggered(self):
         # try:
         twoDptions, threeDptions = self.getSelectedOptions()
+        if len(threeDptions) != 0 and not self.checkComputationConfig():
+            return
         targetFolder = QFileDialog.getExistingDirectory(None, '选择文件夹')
         if targetFolder:
             progress = QProgressDialog("正在计算指标...", "取消", 0, 100, None)
@@ -263,9 +266,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             progress.show()
             path = []
             if len(threeDptions)!=0:
-                path, progress = calUCP(self.vectorRectangle.buildings, targetFolder, progress,threeDptions)
-                for i in path:
-                    mask_raster_with_vector(self.vectorRectangle.path, i)
+                # 掩膜在 calUCP 中完成（在转换为COG之前）
+                path, progress = calUCP(self.vectorRectangle.buildings, targetFolder, progress,threeDptions,
+                                        self.vectorRectangle.path)
             progress.setValue(90)
             if len(twoDptions)!=0:
                 if len(path) != 0:
@@ -292,6 +295,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     def actionCalMor_polygonTriggered(self):
         twoDptions, threeDptions = self.getSelectedOptions()
+        if len(threeDptions) != 0 and not self.checkComputationConfig():
+            return
         # try:
         targetFolder  = QFileDialog.getExistingDirectory(None, '选择文件夹')
         if targetFolder:
@@ -301,9 +306,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             progress.show()
             path = []
             if len(threeDptions)!=0:
-                path, progress = calUCP(self.vectorPolygon.buildings, targetFolder, progress, threeDptions)
-                for i in path:
-                    mask_raster_with_vector(self.vectorPolygon.path, i)
+                # 掩膜在 calUCP 中完成（在转换为COG之前）
+                path, progress = calUCP(self.vectorPolygon.buildings, targetFolder, progress, threeDptions,
+                                        self.vectorPolygon.path)
             progress.setValue(90)
             if len(twoDptions)!=0:
                 if len(path) != 0:
@@ -339,6 +344,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         if not self.threadNum:
             self.threadNum.setText('6')
         twoDptions, threeDptions = self.getSelectedOptions()
+        if len(threeDptions) != 0 and not self.checkComputationConfig():
+            return
         progress = QProgressDialog("正在计算...", "取消", 0, 100, None)
         progress.setWindowTitle("请稍候")
         progress.setModal(True)
@@ -356,6 +363,15 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         progress.close()
         QMessageBox.information(None, "成功", "计算完成！")
 
+    def checkComputationConfig(self):
+        # 开始计算前读取并检查 config.json 中的计算配置（dh 高度区间、风向和风玫瑰权重），有误时提示并不开始计算
+        try:
+            loadComputationConfig()
+        except ValueError as e:
+            QMessageBox.warning(None, "警告", "配置文件有误：{}".format(e))
+            return False
+        return True
+
     def getSelectedOptions(self):
         # 2d
         twoDptions = []
@@ -376,6 +392,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         if self.lf45.isChecked():threeDptions.append('lf45')
         if self.lf90.isChecked():threeDptions.append('lf90')
         if self.lf135.isChecked():threeDptions.append('lf135')
+        if self.lfN.isChecked():threeDptions.append('lfN')
+        if self.lfRose.isChecked():threeDptions.append('lfRose')
         if self.dh.isChecked():threeDptions.append('dh')
         #2D
         if self.pol.isChecked():twoDptions.append('proportion_of_landscape')
@@ -4,29 +4,16 @@ from pylandstats import Landscape
 import pandas as pd
 import warnings
 
+from computation.kernels import shareEdgeCount
+
 
 class AI(Landscape):
     def __init__(self, landscape, **kwargs):
         super().__init__(landscape, **kwargs)
 
-    # 用于计算每种类型公共边的数量
+    # 用于计算每种类型公共边的数量（右邻和下邻中同类像元的对数，见 computation.kernels.shareEdgeCount）
     def get_share_edge(self, class_):
-        # 1.将数据转换为二值型
-        binary_data = (self.landscape_arr == class_).astype(np.int8)
-        # 2.设置卷积模板
-        cov_template = np.array([[0, 0, 0],
-                                 [0, 0, 1],
-                                 [0, 1, 0]])
-        # 3.填充边缘
-        binary_pad = np.pad(binary_data, 1, mode='constant', constant_values=0)
-        # 4.计算公共边总数
-        row_num, col_num = binary_pad.shape
-        count = 0
-        for i in range(1, row_num - 1):
-            for j in range(1, col_num - 1):
-                if binary_pad[i, j] == 1:
-                    count += np.sum(binary_pad[i - 1:i + 2, j - 1:j + 2] * cov_template)
-        return count
+        return shareEdgeCount(self.landscape_arr, class_)
 
     # 计算eii
     @property
@@ -0,0 +1,347 @@
+# coding=utf-8
+# 网格统计：每个网格只保存可相加的统计量（数量、高度和、高度平方和、面积、体积、墙面面积、迎风面积、高度分布），
+# 分片/分文件的结果直接相加即可合并，最后再由这些和推导 mh、stdh、haw、λp、λb、λf
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from computation.buildings import Buildings
+from computation.kernels import binCount2d, searchBins
+
+# 可相加的统计量名称（frontalN 为可配置的 k 个风向上的迎风面积）
+allSumNames = ('count', 'sumHeight', 'sumSqHeight', 'area', 'volume', 'wallArea', 'frontal', 'frontalN', 'dh')
+# 只在所选参数需要时统计的统计量（frontalN 需要建筑的 projLength，只在选择 λfN / λfRose 时由 planIndicators 加入）
+optionalSums = ('frontalN',)
+# 未指定时默认统计的统计量
+sumNames = tuple(name for name in allSumNames if name not in optionalSums)
+# 紧凑精度下以整型保存的参数（计数）
+countIndicators = ('count',)
+# 每个参数依赖的网格统计量
+indicatorSums = {
+    'count': ('count',), 'sum': ('sumHeight',), 'area': ('area',), 'volume': ('volume',),
+    'mh': ('count', 'sumHeight'), 'stdh': ('count', 'sumHeight', 'sumSqHeight'), 'haw': ('volume', 'area'),
+    'lb': ('wallArea',), 'lp': ('area',),
+    'lf0': ('frontal',), 'lf45': ('frontal',), 'lf90': ('frontal',), 'lf135': ('frontal',),
+    'lfN': ('frontalN',), 'lfRose': ('frontalN',),
+    'dh': ('dh',),
+}
+# 每个网格统计量依赖的建筑属性（中心点总是需要）
+sumAttributes = {
+    'count': (), 'sumHeight': ('height',), 'sumSqHeight': ('height',), 'area': ('area',),
+    'volume': ('area', 'height'), 'wallArea': ('area', 'height', 'perimeter'), 'frontal': ('height', 'proj4Length'),
+    'frontalN': ('height', 'projLength'), 'dh': ('height',),
+}
+# 各参数结果的文件名
+outputNames = {'count': 'count', 'sum': 'sumHei', 'area': 'area', 'volume': 'volume', 'mh': 'mh', 'stdh': 'stdh',
+               'haw': 'haw', 'lb': 'λb', 'lp': 'λp', 'lf0': 'λf0', 'lf45': 'λf45', 'lf90': 'λf90', 'lf135': 'λf135',
+               'lfN': 'λfN', 'lfRose': 'λfRose', 'dh': 'dh'}
+# 精确占地分摊时按各网格内占地比例拆分的统计量（数量和高度统计仍按中心点所在网格）
+apportionedSums = ('area', 'volume', 'wallArea', 'frontal', 'frontalN')
+# 需要网格面积（AT）的参数
+gridAreaIndicators = ('lb', 'lp', 'lf0', 'lf45', 'lf90', 'lf135', 'lfN', 'lfRose')
+
+
+def planIndicators(options, exact=False):
+    """
+    按所选参数确定最少的计算量，未用到的投影长度、墙面面积、高度分布和网格面积全部跳过。
+    exact 为 True（精确占地分摊）且用到面积类统计量时，需要的建筑属性中加入各部分的占地比例。
+
+    返回:
+    sums (tuple): 需要的网格统计量（count 总是统计，用于数据质量汇总）。
+    attributes (tuple): 需要的建筑属性。
+    needGridArea (bool): 是否需要计算网格面积。
+    """
+    needed = {'count'}.union(*(indicatorSums[option] for option in options))
+    sums = tuple(name for name in allSumNames if name in needed)
+    needed = {'height', 'area', 'centroid'}.union(*(sumAttributes[name] for name in sums))  # 读取和筛选总会得到这些
+    attributes = tuple(name for name in ('height', 'area', 'perimeter', 'centroid', 'proj4Length', 'projLength')
+                       if name in needed)
+    if exact and any(name in apportionedSums for name in sums):
+        attributes += Buildings.pieceAttributes
+    return sums, attributes, any(option in gridAreaIndicators for option in options)
+
+
+def calcuWallArea(area, height, perimeter):
+    return area + perimeter * height  # 返回一个建筑物的表面积（顶面面积（占地面积）+侧面积（周长*高度））
+
+
+def gridBins(minLon, maxLon, minLat, maxLat, numberOfEachDegree):  # 整度范围内按分辨率划分bin
+    binX = np.linspace(minLon, maxLon, (maxLon - minLon) * numberOfEachDegree + 1)  # 划分bin用于统计
+    binY = np.linspace(minLat, maxLat, (maxLat - minLat) * numberOfEachDegree + 1)  # 划分bin用于统计 （注意纬度区间！）
+    return binY, binX
+
+
+def metricBins(bounds, cellSize):
+    """
+    投影坐标范围 (minx, miny, maxx, maxy) 内边长 cellSize（米）的网格边界 binY, binX。
+    网格原点取 cellSize 的整数倍，同一坐标系下不同文件（分片）的网格互相对齐。
+    """
+    first = np.floor(np.asarray(bounds[:2], dtype='float64') / cellSize).astype('int64')
+    last = np.floor(np.asarray(bounds[2:], dtype='float64') / cellSize).astype('int64')
+    binX = (first[0] + np.arange(last[0] - first[0] + 2)) * float(cellSize)
+    binY = (first[1] + np.arange(last[1] - first[1] + 2)) * float(cellSize)
+    return binY, binX
+
+
+def metricCellIndex(points, binY, binX):
+    """
+    投影坐标点所在米制网格的扁平序号（行优先 iy * nx + ix），范围外（含 NaN）为 -1。
+    网格边长固定，行列号由坐标除以边长向下取整后减去原点的整数行列号得到，不需要逐区间查找。
+    """
+    cellSize = binX[1] - binX[0]
+    valid = np.isfinite(points).all(axis=1)
+    ix = np.full(len(points), -1, dtype='int64')
+    iy = np.full(len(points), -1, dtype='int64')
+    ix[valid] = np.floor(points[valid, 0] / cellSize).astype('int64') - int(round(binX[0] / cellSize))
+    iy[valid] = np.floor(points[valid, 1] / cellSize).astype('int64') - int(round(binY[0] / cellSize))
+    nx, ny = len(binX) - 1, len(binY) - 1
+    return np.where((ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny), iy * nx + ix, -1)
+
+
+def uniformBins(values, edges):
+    """
+    等间距边界（如经纬网格）上每个值所在区间的序号，与 searchBins 相同（NaN 为 len(edges) - 1）。
+    按步长换算序号后与相邻两个边界比较，修正换算的舍入误差（至多差 1），不需要逐区间查找。
+    """
+    n = len(edges) - 1
+    scaled = np.clip((values - edges[0]) * (n / (edges[-1] - edges[0])), -1, n)
+    scaled[np.isnan(scaled)] = n
+    index = np.floor(scaled).astype('int64')
+    padded = np.concatenate([[-np.inf], edges, [np.inf]])  # padded[i + 1] 即 edges[i]，范围外的序号 -1 和 n 也有相邻边界
+    index -= values < padded[index + 1]
+    index += values >= padded[index + 2]
+    return np.minimum(index, n, out=index)  # +inf 与最右边界之外的值相同
+
+
+def digitize(values, edges):
+    """
+    每个值所在区间的序号，范围外（含 NaN）为 -1。
+    分箱规则与 scipy binned_statistic 相同：左闭右开，恰好落在最右边界（按同样的舍入精度）上的值归入最后一个区间。
+    边界等间距（经纬网格）时按步长换算，否则逐区间查找。
+    """
+    edges = np.asarray(edges, dtype='float64')
+    step = np.diff(edges)
+    uniform = len(step) > 1 and np.allclose(step, step[0], rtol=1e-9, atol=0)
+    index = uniformBins(values, edges) if uniform else searchBins(values, edges)
+    decimal = int(-np.log10(step.min())) + 6
+    right = np.flatnonzero(values >= edges[-1])
+    onEdge = right[np.around(values[right], decimal) == np.around(edges[-1], decimal)]
+    index[onEdge] -= 1
+    index[(index < 0) | (index >= len(edges) - 1)] = -1
+    return index
+
+
+def pointCellIndex(points, binY, binX):  # 经纬度点所在网格的扁平序号（行优先 iy * nx + ix），范围外为 -1
+    iy = digitize(points[:, 1], binY)
+    ix = digitize(points[:, 0], binX)
+    return np.where((iy >= 0) & (ix >= 0), iy * (len(binX) - 1) + ix, -1)
+
+
+def cellIndex(buildings, binY, binX):  # 每个建筑中心点所在网格的扁平序号，范围外为 -1
+    return pointCellIndex(buildings.centroid, binY, binX)
+
+
+def pieceCellIndex(buildings, binY, binX):  # 精确占地分摊时跨网格建筑各部分所在网格的扁平序号，没有分摊信息时为 None
+    return None if buildings.pieceCount is None else pointCellIndex(buildings.pieceCenter, binY, binX)
+
+
+def aggregateCells(buildings, cell, size, binZ, sums=sumNames, pieceCell=None):
+    """
+    按每个建筑的网格序号 cell（0..size-1，-1 表示不统计）累加可相加量，返回 {名称: (..., size)}。
+
+    每个统计量都是一次 np.bincount；只统计 sums 中列出的统计量。
+    给出 pieceCell（跨网格建筑各部分所在网格，见 computation.apportion）时，apportionedSums 中的统计量
+    按各网格内的占地比例分摊，数量和高度统计仍按中心点所在网格。
+    """
+    inside = cell >= 0
+    nz = len(binZ) - 1
+    # 属性为 float32（紧凑精度）时，乘积和累加仍在 float64 下进行
+    height = buildings.height.astype('float64')
+
+    if pieceCell is None:  # 按中心点：每个建筑整体计入中心点所在网格
+        owner, target, share = np.flatnonzero(inside), cell[inside], None
+    else:  # 未跨网格的建筑整体计入中心点所在网格，跨网格的建筑各部分按占地比例计入所在网格
+        split = buildings.pieceCount > 0
+        owner = np.concatenate([np.flatnonzero(~split), np.repeat(np.flatnonzero(split), buildings.pieceCount[split])])
+        target = np.concatenate([cell[~split], pieceCell])
+        share = np.concatenate([np.ones(len(split) - split.sum()), buildings.pieceFraction])
+        keep = target >= 0
+        owner, target, share = owner[keep], target[keep], share[keep]
+
+    def cellSum(values=None):  # 按中心点所在网格累加
+        return np.bincount(cell[inside], weights=None if values is None else values[inside], minlength=size) \
+            .astype('float64')
+
+    def apportionedSum(values):  # 面积类统计量：按中心点或按占地比例分摊
+        weights = values[owner] if share is None else values[owner] * share
+        return np.bincount(target, weights=weights, minlength=size).astype('float64')  # 没有建筑时 bincount 返回整型
+
+    def dhCount():
+        iz = digitize(height[inside], binZ)
+        inZ = iz >= 0
+        return binCount2d(iz[inZ], cell[inside][inZ], nz, size)
+
+    def frontalSum():
+        proj4Area = buildings.proj4Length * height.reshape(-1, 1)  # 四个方向上的投影面积
+        return np.stack([apportionedSum(proj4Area[:, i]) for i in range(4)])
+
+    def frontalNSum():  # 全部风向一次累加：(网格 × 建筑) 的稀疏权重矩阵乘以 (建筑 × 风向) 的投影长度，得到 (k, size)
+        weights = height[owner] if share is None else height[owner] * share
+        matrix = csr_matrix((weights, (target, owner)), shape=(size, len(height)))
+        return np.ascontiguousarray((matrix @ buildings.projLength.astype('float64')).T)
+
+    def attribute(name):
+        return getattr(buildings, name).astype('float64')
+
+    statistics = {
+        'count': lambda: cellSum(),
+        'sumHeight': lambda: cellSum(height),
+        'sumSqHeight': lambda: cellSum(height ** 2),
+        'area': lambda: apportionedSum(attribute('area')),
+        'volume': lambda: apportionedSum(attribute('area') * height),
+        'wallArea': lambda: apportionedSum(calcuWallArea(attribute('area'), height, attribute('perimeter'))),
+        'frontal': frontalSum,
+        'frontalN': frontalNSum,
+        'dh': dhCount,
+    }
+    return {name: statistics[name]() for name in sums}
+
+
+def aggregateGrid(buildings, binY, binX, binZ, sums=sumNames, cell=None):
+    """
+    单次遍历统计每个网格的可相加量，返回 {名称: 网格}（frontal 为 (4, ny, nx)，dh 为 (nz, ny, nx)）。
+
+    每个建筑的网格序号只计算一次，之后每个统计量都是一次 np.bincount；建筑带有分摊信息（pieceCount）时按占地比例分摊。
+    cell 为预先算好的网格序号（如投影米制网格，见 metricCellIndex），给出时按中心点统计，不再按经纬度计算。
+    """
+    ny, nx = len(binY) - 1, len(binX) - 1
+    if cell is None:
+        cells = aggregateCells(buildings, cellIndex(buildings, binY, binX), ny * nx, binZ, sums,
+                               pieceCellIndex(buildings, binY, binX))
+    else:
+        cells = aggregateCells(buildings, cell, ny * nx, binZ, sums)
+    return {name: value.reshape(value.shape[:-1] + (ny, nx)) for name, value in cells.items()}
+
+
+def pyramidFactors(finest, resolutions):
+    """
+    各输出分辨率（每度网格数）相对统计分辨率 finest 的合并块大小 [(分辨率, 块大小), ...]，由细到粗。
+    输出分辨率须能整除 finest（如 finest=120 时可输出 120、60、24、12）。
+    """
+    levels = []
+    for resolution in sorted(set(resolutions), reverse=True):
+        if finest % resolution:
+            raise ValueError("输出分辨率 1/{}° 不能由 1/{}° 的网格合并得到".format(resolution, finest))
+        levels.append((resolution, finest // resolution))
+    return levels
+
+
+def coarsenAggregates(sums, factor):
+    """相邻 factor×factor 个网格的统计量相加，得到粗一级分辨率的网格统计量（行列数须能被 factor 整除）"""
+    if factor == 1:
+        return sums
+    coarse = {}
+    for name, value in sums.items():
+        ny, nx = value.shape[-2:]
+        blocks = value.reshape(value.shape[:-2] + (ny // factor, factor, nx // factor, factor))
+        coarse[name] = blocks.sum(axis=(-3, -1))
+    return coarse
+
+
+def mergeAggregates(aggregatesList):  # 同一网格上的多份统计量逐项相加
+    merged = {name: value.copy() for name, value in aggregatesList[0].items()}
+    for aggregates in aggregatesList[1:]:
+        for name in merged:
+            merged[name] += aggregates[name]
+    return merged
+
+
+def dhDtype(maxCount):  # 高度分布计数的整型：每个网格的建筑数不超过 65535 时用 uint16
+    return 'uint16' if maxCount <= np.iinfo('uint16').max else 'uint32'
+
+
+def dhHistogram(counts, cumulative=False, maxCount=None):
+    """
+    高度分布：每个高度区间的建筑数量 (nz, ...)，cumulative 为 True 时输出累积分布（高度低于各区间上界的建筑数量）。
+    maxCount 为每个网格建筑数量的上界（逐窗口写出时按整个文件给出，保证各窗口类型一致）。
+    """
+    if cumulative:
+        counts = np.cumsum(counts, axis=0)
+    if maxCount is None:
+        maxCount = counts.sum(axis=0).max() if counts.size else 0
+    return counts.astype(dhDtype(maxCount))
+
+
+def deriveIndicators(sums, gridTotalArea, options=None, dhCumulative=False, dhMaxCount=None, windWeights=None):
+    """
+    由可相加的统计量推导UCP参数，键与界面选项一致；只推导 options 中的参数（所需统计量见 indicatorSums），
+    默认为 sums 中统计量足以推导的全部参数。windWeights 为 frontalN 各风向的频率（风玫瑰），用于 lfRose，默认各风向等权。
+    """
+    if options is None:
+        options = [option for option in indicatorSums if all(name in sums for name in indicatorSums[option])]
+
+    def meanHeight():
+        return sums['sumHeight'] / sums['count']
+
+    def roseFrontal():  # 风玫瑰加权的λf：各风向的迎风面积按频率加权后除以网格面积
+        frontal = sums['frontalN']
+        weights = np.ones(len(frontal)) if windWeights is None else np.asarray(windWeights, dtype='float64')
+        return np.tensordot(weights / weights.sum(), frontal, axes=1) / gridTotalArea
+
+    def stdHeight():
+        # E[h²] − E[h]² 在高度全部相同时相减抵消，只剩累加的舍入误差（不超过约 count·eps·E[h²]），会得到约 1e-7 m 的
+        # 伪标准差：不超过该误差（留 4 倍余量）的方差（含负值）视为 0，没有建筑的网格仍为 NaN
+        meanSquare = sums['sumSqHeight'] / sums['count']
+        variance = meanSquare - meanHeight() ** 2
+        roundoff = 4 * np.finfo('float64').eps * sums['count'] * meanSquare
+        return np.sqrt(np.where(variance <= roundoff, 0, variance))
+
+    formulas = {
+        'count': lambda: sums['count'],
+        'sum': lambda: sums['sumHeight'],
+        'area': lambda: sums['area'],
+        'volume': lambda: sums['volume'],
+        # mean and standard deviation of building height (mh, stdh) --- pixel中的均值和标准差
+        'mh': meanHeight,
+        'stdh': stdHeight,
+        # average building height weighted by building plan area (haw) --- pixel中的面积加权
+        'haw': lambda: sums['volume'] / sums['area'],
+        # building surface area to plan area ratio (λb)  --- 表面面积比
+        'lb': lambda: sums['wallArea'] / gridTotalArea,
+        # building plan area fraction (λp)  --- 占地面积比
+        'lp': lambda: sums['area'] / gridTotalArea,
+        # frontal area index (λf)  ---  峰向指数（proj4Length 列顺序为 0/90/45/135）
+        'lf0': lambda: sums['frontal'][0] / gridTotalArea,
+        'lf90': lambda: sums['frontal'][1] / gridTotalArea,
+        'lf45': lambda: sums['frontal'][2] / gridTotalArea,
+        'lf135': lambda: sums['frontal'][3] / gridTotalArea,
+        # λf for k configurable wind directions (k, ...) and wind-rose-weighted λf  ---  多风向及风玫瑰加权的峰向指数
+        'lfN': lambda: sums['frontalN'] / gridTotalArea,
+        'lfRose': roseFrontal,
+        # Distribution of building heights  ---  高度分布
+        'dh': lambda: dhHistogram(sums['dh'], dhCumulative, dhMaxCount),
+    }
+    return {option: formulas[option]() for option in options}
+
+
+def bandNames(option, binZ, angles):  # 参数结果各波段的名称：dh 每个高度区间一个 dh_下界_上界，λfN 每个风向一个 λfN_风向
+    if option == 'dh':
+        return ['dh_{:g}_{:g}'.format(binZ[z], binZ[z + 1]) for z in range(len(binZ) - 1)]
+    if option == 'lfN':
+        return ['{}_{:g}'.format(outputNames['lfN'], angle) for angle in angles]
+    return [outputNames[option]]
+
+
+def bandCount(option, binZ, angles):  # 参数结果的波段数
+    return len(bandNames(option, binZ, angles))
+
+
+def indicatorDtype(option, compact=False):  # 参数结果的数据类型
+    if not compact:
+        return 'float64'
+    return 'uint32' if option in countIndicators else 'float32'
+
+
+def compactIndicators(indicators):  # 紧凑精度：计数转为 uint32，其余参数转为 float32（在 float64 下推导完成后再转换）
+    return {name: value if value.dtype.kind == 'u' else value.astype(indicatorDtype(name, True))
+            for name, value in indicators.items()}
@@ -0,0 +1,64 @@
+# coding=utf-8
+# 精确占地分摊：跨网格边界的建筑按各网格内的占地比例拆分，面积、体积、墙面面积和迎风面积按比例计入各网格。
+# 网格为规则经纬网格，每个建筑外包矩形覆盖的网格由下标运算直接得到，只有跨网格的建筑（1/120° 下通常只占几个百分点）
+# 才与网格求交，不需要对网格建立空间索引。
+
+import numpy as np
+import shapely
+
+from computation.buildings import buildPolygons
+
+
+def footprintBounds(coords, offsets):  # 每个建筑外环的经纬度外包矩形 (N, 4)：minLon, minLat, maxLon, maxLat
+    start = offsets[:-1]
+    return np.column_stack([np.minimum.reduceat(coords[:, 0], start), np.minimum.reduceat(coords[:, 1], start),
+                            np.maximum.reduceat(coords[:, 0], start), np.maximum.reduceat(coords[:, 1], start)])
+
+
+def footprintPieces(coords, offsets, numberOfEachDegree):
+    """
+    计算跨网格建筑在各网格内的占地比例（网格为每度 numberOfEachDegree 个的全球经纬网格）。
+
+    参数:
+    coords, offsets: 建筑外环的扁平经纬度顶点和偏移（见 Buildings）。
+
+    返回:
+    pieceCount (np.ndarray): (N,) 每个建筑拆分的部分数，只落在一个网格内的建筑为 0（整体计入中心点所在网格）。
+    pieceCenter (np.ndarray): (P, 2) 每个部分所在网格的中心经纬度，按建筑顺序排列。
+    pieceFraction (np.ndarray): (P,) 每个部分占建筑占地面积的比例，同一建筑的比例之和为 1。
+    """
+    bounds = footprintBounds(coords, offsets)
+    first = np.floor(bounds[:, :2] * numberOfEachDegree).astype('int64')  # 外包矩形左下、右上角所在网格的全球行列号
+    last = np.floor(bounds[:, 2:] * numberOfEachDegree).astype('int64')
+    span = last - first + 1
+    cross = np.flatnonzero((span > 1).any(axis=1))
+    pieceCount = np.zeros(len(bounds), dtype='int64')
+    if not len(cross):
+        return pieceCount, np.empty((0, 2)), np.empty(0)
+
+    # 跨网格的建筑：外包矩形覆盖的每个网格都作为候选部分
+    candidates = span[cross, 0] * span[cross, 1]
+    owner = np.repeat(np.arange(len(cross)), candidates)
+    local = np.arange(len(owner)) - np.repeat(np.cumsum(candidates) - candidates, candidates)
+    ix = first[cross, 0][owner] + local % span[cross, 0][owner]
+    iy = first[cross, 1][owner] + local // span[cross, 0][owner]
+
+    vertexMask = np.zeros(len(bounds), dtype='bool')
+    vertexMask[cross] = True
+    vertexCounts = np.diff(offsets)[cross]
+    crossOffsets = np.zeros(len(cross) + 1, dtype='int64')
+    crossOffsets[1:] = np.cumsum(vertexCounts)
+    polygons = buildPolygons(coords[np.repeat(vertexMask, np.diff(offsets))], crossOffsets)
+    invalid = ~shapely.is_valid(polygons)
+    polygons[invalid] = shapely.make_valid(polygons[invalid])
+    # 网格内的经纬度面积之比即占地比例（建筑尺度上投影变形可视为常数）
+    cells = shapely.box(ix / numberOfEachDegree, iy / numberOfEachDegree,
+                        (ix + 1) / numberOfEachDegree, (iy + 1) / numberOfEachDegree)
+    pieceArea = shapely.area(shapely.intersection(polygons[owner], cells))
+    keep = pieceArea > 0
+    owner, ix, iy, pieceArea = owner[keep], ix[keep], iy[keep], pieceArea[keep]
+    total = np.bincount(owner, weights=pieceArea, minlength=len(cross))
+
+    pieceCount[cross] = np.bincount(owner, minlength=len(cross))
+    pieceCenter = np.column_stack([(ix + 0.5) / numberOfEachDegree, (iy + 0.5) / numberOfEachDegree])
+    return pieceCount, pieceCenter, pieceArea / total[owner]
@@ -0,0 +1,780 @@
+# coding=utf-8
+# 计算核心的对照检查与性能测试，用法: python -m computation.benchmark [名称 ...]
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from itertools import combinations
+from math import cos, sin, radians
+
+import fiona
+import numpy as np
+import rasterio
+import shapely
+from pyproj import Geod
+from rasterio.transform import from_origin
+from scipy import stats
+from shapely.geometry import MultiPoint
+
+from computation.aggregate import aggregateCells, aggregateGrid, allSumNames, bandNames, cellIndex, coarsenAggregates, compactIndicators, deriveIndicators, dhHistogram, \
+    gridBins, metricBins, metricCellIndex, pointCellIndex, pyramidFactors, uniformBins
+from computation.sparse import aggregateSparse, coarsenSparse, denseWindow, iterWindows
+from computation.apportion import footprintPieces
+from computation.zonal import assignZones, zoneAreas
+from computation.cog import closeTargets, convertToCog, openStack, writeTargets
+from computation.buildings import Buildings, buildPolygons, polygonMetrics
+from computation import pipeline, reader
+from computation.quality import newRejected
+from computation import kernels
+from computation.frontal import calcu4ProjLengthRagged, calcuProjLengthByAngles, frontalDirections, proj4Directions
+from computation.projection import ellipsoidRowArea, extentCenter, gridCellArea, localEqualAreaTransformers, \
+    localGridCorrection, metricGridCrs, projectPoints, projectRingsByZone, utmGridCorrection, utmTransformers
+
+
+# 参考椭球体：投影长度和面积的大地线对照
+geod = Geod(ellps='WGS84')
+
+
+def calcu4ProjLengthByPairs(coordiList):  # 计算四个方向上的投影长度（全部顶点两两组合，O(n²)，对照实现）
+    numberOfCombi = (len(coordiList)) * (len(coordiList) - 1) // 2  # to int
+    proj4LengthMat = np.zeros([numberOfCombi, 4])  # 开空间存结果
+    # 计算建筑物每条边的投影长度
+    for count, dotPair in enumerate(combinations(coordiList, 2), 0):
+        azimuth1, azimuth2, distance = geod.inv(dotPair[0][0], dotPair[0][1], dotPair[1][0], dotPair[1][1])
+        proj4LengthMat[count, 0] = abs(distance * sin(radians((azimuth1 + 360) % 360)))  # fro 0 (东西方向上的投影长度（和北风0°垂直）)
+        proj4LengthMat[count, 1] = abs(distance * cos(radians((azimuth1 + 360) % 360)))  # fro 90 (南北方向上的投影长度（和东风90°垂直）)
+        proj4LengthMat[count, 2] = abs(
+            distance * sin(radians((azimuth1 + 360) % 360 - 45)))  # fro 45 (东南(西北)方向上的投影长度(和东北风45°垂直))
+        proj4LengthMat[count, 3] = abs(
+            distance * cos(radians((azimuth1 + 360) % 360 - 45)))  # fro 135 (东北(西南)方向上的投影长度(和东南风135°垂直))
+    # 返回最大的作为该建筑的投影长度
+    return proj4LengthMat.max(axis=0)  # np.array[max(0), max(90), max(45), max(135)]  shape->(4,)
+
+
+def convexHullVertices(coordiList):  # 凸包顶点（不含闭合点），退化为线/点时返回其端点
+    hull = MultiPoint([tuple(item[:2]) for item in coordiList]).convex_hull
+    if hull.geom_type == 'Polygon':
+        return np.asarray(hull.exterior.coords)[:-1]
+    return np.asarray(hull.coords)
+
+
+def calcu4ProjLength(coordiList):  # 逐建筑大地线反算四个方向上的投影长度（凸包极值点，对照实现）
+    """
+    某方向上的最大投影长度只取决于凸包在该方向上的两个极值点。
+    先在局部等距平面上求凸包及四个方向（0/90/45/135）的极值点对，再只对这几对点做大地线反算，
+    结果与 calcu4ProjLengthByPairs 一致。
+    """
+    hull = convexHullVertices(coordiList)
+    # 局部平面（经度按卯酉圈/子午圈曲率半径之比缩放），只用于挑选极值点
+    phi = radians(hull[:, 1].mean())
+    e2 = geod.es
+    x = (hull[:, 0] - hull[0, 0]) * cos(phi) * (1 - e2 * sin(phi) ** 2) / (1 - e2)
+    y = hull[:, 1] - hull[0, 1]
+    projection = np.column_stack([x, y, x - y, x + y])  # 与四列投影长度的方向一一对应
+    first, second = projection.argmin(axis=0), projection.argmax(axis=0)
+    azimuth1, azimuth2, distance = geod.inv(hull[first, 0], hull[first, 1], hull[second, 0], hull[second, 1])
+    azimuth = np.radians((np.asarray(azimuth1) + 360) % 360)
+    distance = np.asarray(distance)
+    proj4LengthMat = np.abs(np.column_stack([distance * np.sin(azimuth),
+                                             distance * np.cos(azimuth),
+                                             distance * np.sin(azimuth - radians(45)),
+                                             distance * np.cos(azimuth - radians(45))]))
+    return proj4LengthMat.max(axis=0)  # np.array[max(0), max(90), max(45), max(135)]  shape->(4,)
+
+
+def randomFootprints(numberOfPolygon=500, maxVertex=60, seed=0, lon0=116.3, lat0=39.9):  # 随机生成建筑轮廓（经纬度）
+    rng = np.random.default_rng(seed)
+    footprints = []
+    for _ in range(numberOfPolygon):
+        n = rng.integers(3, maxVertex + 1)
+        angle = np.sort(rng.uniform(0, 2 * np.pi, n))
+        radius = rng.uniform(2e-5, 3e-4, n)
+        lon = lon0 + rng.uniform(-0.5, 0.5) + radius * np.cos(angle)
+        lat = lat0 + rng.uniform(-0.5, 0.5) + radius * np.sin(angle)
+        footprints.append(np.column_stack([lon, lat]))
+    return footprints
+
+
+def timeIt(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def benchProjLength(numberOfPolygon=500, maxVertex=60, seed=0):
+    """凸包投影长度与两两组合实现的对照：报告最大绝对误差与加速比"""
+    footprints = randomFootprints(numberOfPolygon, maxVertex, seed)
+    reference, tReference = timeIt(lambda: np.array([calcu4ProjLengthByPairs(item) for item in footprints]))
+    result, tResult = timeIt(lambda: np.array([calcu4ProjLength(item) for item in footprints]))
+    absError = np.abs(result - reference).max()
+    print("projLength  {} 个建筑  两两组合 {:.3f}s  凸包 {:.3f}s  加速 {:.1f}x  最大绝对误差 {:.2e} m".format(
+        numberOfPolygon, tReference, tResult, tReference / tResult, absError))
+    assert absError < 1e-3, "凸包投影长度与对照实现不一致"  # 1 mm
+    return absError
+
+
+def flattenFootprints(footprints):  # 轮廓列表 -> 扁平顶点 + 偏移
+    offsets = np.zeros(len(footprints) + 1, dtype='int64')
+    offsets[1:] = np.cumsum([len(item) for item in footprints])
+    return np.concatenate(footprints), offsets
+
+
+def benchProjLengthRagged(numberOfPolygon=2000, maxVertex=60, seed=0):
+    """扁平坐标一次性计算 (N, 4) 投影长度，与逐建筑大地线实现对照"""
+    footprints = randomFootprints(numberOfPolygon, maxVertex, seed)
+    geoCoords, offsets = flattenFootprints(footprints)
+    projCoords, keys = projectRingsByZone(geoCoords, offsets, utmTransformers)
+    firstPoint = geoCoords[offsets[:-1]]
+    convergence, scale = utmGridCorrection(firstPoint[:, 0], firstPoint[:, 1], keys)
+    reference, tReference = timeIt(lambda: np.array([calcu4ProjLength(item) for item in footprints]))
+    result, tResult = timeIt(calcu4ProjLengthRagged, projCoords, offsets, convergence, scale)
+    absError = np.abs(result - reference).max()
+    print("projLengthRagged  {} 个建筑  逐建筑 {:.3f}s  扁平数组 {:.4f}s  加速 {:.1f}x  最大绝对误差 {:.2e} m".format(
+        numberOfPolygon, tReference, tResult, tReference / tResult, absError))
+    assert absError < 1e-2, "扁平数组投影长度与逐建筑实现不一致"  # 1 cm
+    return absError
+
+
+def benchLocalProjection(numberOfPolygon=20000, maxVertex=60, seed=0, lon0=120.0, lat0=31.0):
+    """
+    单个局部等积投影（LAEA）与逐建筑UTM分带投影的对照（默认城市跨 120°E 分带边界）：
+    报告投影耗时加速比、面积相对误差（以椭球面大地线面积为准，UTM面积与计算流程一致按 k² 改正）和投影长度误差。
+    网格面积的误差见 benchCellArea。
+    """
+    footprints = randomFootprints(numberOfPolygon, maxVertex, seed, lon0, lat0)
+    geoCoords, offsets = flattenFootprints(footprints)
+    firstPoint = geoCoords[offsets[:-1]]
+
+    def utmPath():
+        projCoords, keys = projectRingsByZone(geoCoords, offsets, utmTransformers)
+        return projCoords, utmGridCorrection(firstPoint[:, 0], firstPoint[:, 1], keys)
+
+    def localPath():
+        center = extentCenter((*geoCoords.min(axis=0), *geoCoords.max(axis=0)))
+        forward, _ = localEqualAreaTransformers(*center)
+        projCoords = np.column_stack(forward.transform(geoCoords[:, 0], geoCoords[:, 1]))
+        return projCoords, localGridCorrection(firstPoint[:, 0], firstPoint[:, 1], *center)
+
+    (utmCoords, utmCorrection), tUtm = min((timeIt(utmPath) for _ in range(3)), key=lambda item: item[1])  # 取3次最快
+    (localCoords, localCorrection), tLocal = min((timeIt(localPath) for _ in range(3)), key=lambda item: item[1])
+    utmArea = polygonMetrics(buildPolygons(utmCoords, offsets))[0] / utmCorrection[1] ** 2  # 与计算流程相同的 k² 改正
+    localArea = polygonMetrics(buildPolygons(localCoords, offsets))[0]
+    geodArea = np.array([abs(geod.polygon_area_perimeter(item[:, 0], item[:, 1])[0]) for item in footprints])
+    valid = geodArea >= 5  # 与计算流程的最小面积筛选一致（面积很小的狭长多边形的大地线面积本身不够精确）
+    utmError = np.abs(utmArea[valid] / geodArea[valid] - 1).max()
+    localError = np.abs(localArea[valid] / geodArea[valid] - 1).max()
+    print("localProjection  {} 个建筑  UTM分带 {:.4f}s  局部等积 {:.4f}s  加速 {:.1f}x".format(
+        numberOfPolygon, tUtm, tLocal, tUtm / tLocal))
+    print("    面积相对误差（对椭球面）  UTM（k²改正） {:.2e}  局部等积 {:.2e}  两者之差 {:.2e}".format(
+        utmError, localError, np.abs(localArea[valid] / utmArea[valid] - 1).max()))
+
+    reference = np.array([calcu4ProjLength(item) for item in footprints[:2000]])
+    subset = offsets[:2001]
+    utmLength = calcu4ProjLengthRagged(utmCoords[:subset[-1]], subset, *(item[:2000] for item in utmCorrection))
+    localLength = calcu4ProjLengthRagged(localCoords[:subset[-1]], subset, *(item[:2000] for item in localCorrection))
+    print("    投影长度最大绝对误差（对大地线）  UTM {:.2e} m  局部等积 {:.2e} m".format(
+        np.abs(utmLength - reference).max(), np.abs(localLength - reference).max()))
+
+    assert localError < 1e-4 and utmError < 1e-4, "投影面积（对椭球面）误差过大"
+    return localError
+
+
+def writeFootprints(path, footprints, heights):  # 轮廓和高度写为临时shapefile（经纬度）
+    schema = {'geometry': 'Polygon', 'properties': {'Height': 'float'}}
+    with fiona.open(path, 'w', driver='ESRI Shapefile', schema=schema, crs='EPSG:4326') as dst:
+        dst.writerecords({'geometry': {'type': 'Polygon', 'coordinates': [np.vstack([item, item[:1]]).tolist()]},
+                          'properties': {'Height': float(height)}} for item, height in zip(footprints, heights))
+
+
+def benchReader(numberOfPolygon=30000, maxVertex=12, seed=0):
+    """
+    批量读取（pyogrio）与逐要素读取（fiona）的对照：临时shapefile的要素数超过 OGRSQL 按序号筛选的上限（4997），
+    并含低于最小高度的要素，对整个文件和一个要素区间分别比较顶点、高度和剔除计数，报告读取耗时
+    """
+    if reader.read_arrow is None:
+        print("reader  未安装 pyogrio，只有逐要素读取")
+        return None
+    rng = np.random.default_rng(seed)
+    footprints = randomFootprints(numberOfPolygon, maxVertex, seed)
+    heights = rng.gamma(2.0, 8.0, numberOfPolygon)  # 约 1% 低于 1 m
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'buildings.shp')
+    try:
+        writeFootprints(path, footprints, heights)
+        worst = 0
+        for featureRange in (None, (7000, 23000)):
+            results = {}
+            for backend in ('bulk', 'stream'):
+                rejected = newRejected()
+                results[backend] = timeIt(reader.readBuildingRings, path, 'Height', 1, backend, None, featureRange,
+                                          rejected) + (rejected,)
+            (bulk, tBulk, bulkRejected), (stream, tStream, streamRejected) = results['bulk'], results['stream']
+            same = len(bulk) == len(stream) and (bulk.offsets == stream.offsets).all() and \
+                bulkRejected == streamRejected
+            error = max(np.abs(bulk.coords - stream.coords).max(), np.abs(bulk.height - stream.height).max()) \
+                if same else np.inf
+            worst = max(worst, error)
+            print("reader  {} 个要素 区间 {}  保留 {} 个  批量 {:.3f}s  逐要素 {:.3f}s  加速 {:.1f}x  最大差异 {:.1e}".format(
+                numberOfPolygon, featureRange or '全部', len(bulk), tBulk, tStream, tStream / tBulk, error))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    assert worst == 0, "批量读取与逐要素读取结果不一致"
+    return worst
+
+
+def benchShard(numberOfPolygon=20000, maxVertex=12, workers=4, seed=0):
+    """
+    文件内分片：进程池按要素区间分片统计后相加，与整个文件一次统计的对照（经纬网格的中心点和精确占地分摊、投影网格），
+    两种方式的网格（范围、文件名）和统计量应完全一致，与分片数量无关
+    """
+    rng = np.random.default_rng(seed)
+    footprints = randomFootprints(numberOfPolygon, maxVertex, seed)  # 跨越整度经线，部分建筑跨网格
+    heights = rng.uniform(3, 80, numberOfPolygon)
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'buildings.shp')
+    folderDict = {'quality': os.path.join(folder, 'quality')}
+    options = ['count', 'sum', 'area', 'volume', 'mh', 'stdh', 'haw', 'lb', 'lp', 'lf0', 'lf45', 'lf90', 'lf135', 'dh']
+    settings = {name: getattr(pipeline, name) for name in ('useCache', 'gridMode', 'footprintMode')}
+    shardMinFeatures = reader.shardMinFeatures
+    worst = 0
+    try:
+        writeFootprints(path, footprints, heights)
+        pipeline.useCache = False
+        reader.shardMinFeatures = numberOfPolygon // workers
+        for gridMode, footprintMode in (('degree', 'centroid'), ('degree', 'exact'), ('metric', 'centroid')):
+            pipeline.gridMode, pipeline.footprintMode = gridMode, footprintMode
+            (whole, grid), tWhole = timeIt(pipeline.calcuCitySums, path, 'buildings', folderDict, options)
+            with multiprocessing.Pool(workers) as pool:  # 子进程继承上面的设置
+                (shard, shardGrid), tShard = timeIt(pipeline.calcuCitySums, path, 'buildings', folderDict, options,
+                                                    pool, workers)
+            sameGrid = all(np.array_equal(grid[name], shardGrid[name]) for name in ('binY', 'binX')) and \
+                grid['extent'] == shardGrid['extent'] and grid['crs'] == shardGrid['crs']
+            error = max(np.abs(whole[name] - shard[name]).max() / max(np.abs(whole[name]).max(), 1)
+                        for name in whole) if sameGrid else np.inf
+            worst = max(worst, error)
+            print("shard  {} 网格 {}  {} 个要素 {} 片  网格 {}×{} 范围 {}  一次 {:.2f}s  分片 {:.2f}s  网格一致 {}  "
+                  "最大相对差异 {:.1e}".format(gridMode, footprintMode, numberOfPolygon, workers, len(grid['binY']) - 1,
+                                         len(grid['binX']) - 1, grid['extent'], tWhole, tShard, sameGrid, error))
+    finally:
+        for name, value in settings.items():
+            setattr(pipeline, name, value)
+        reader.shardMinFeatures = shardMinFeatures
+        shutil.rmtree(folder, ignore_errors=True)
+    assert worst < 1e-12, "分片统计与整个文件统计的网格或结果不一致"
+    return worst
+
+
+def syntheticBuildings(numberOfBuilding=200000, seed=0, lon0=116.0, lat0=39.0):  # 随机派生属性（1°范围内），用于网格统计测试
+    rng = np.random.default_rng(seed)
+    buildings = Buildings(None, np.zeros(numberOfBuilding + 1, dtype='int64'),
+                          rng.gamma(2.0, 8.0, numberOfBuilding) + 1)
+    buildings.area = rng.lognormal(5, 1, numberOfBuilding) + 5
+    buildings.perimeter = 4 * np.sqrt(buildings.area) * rng.uniform(1, 1.5, numberOfBuilding)
+    buildings.centroid = np.column_stack([lon0 + rng.beta(2, 2, numberOfBuilding),
+                                          lat0 + rng.beta(2, 2, numberOfBuilding)])
+    buildings.proj4Length = np.sqrt(buildings.area).reshape(-1, 1) * rng.uniform(0.8, 1.6, (numberOfBuilding, 4))
+    buildings.projLength = np.sqrt(buildings.area).reshape(-1, 1) * rng.uniform(0.8, 1.6, (numberOfBuilding, 16))
+    return buildings
+
+
+def benchCompactPrecision(numberOfBuilding=200000, seed=0):
+    """紧凑精度（float32 属性/结果、整型计数）与 float64 基准的容差报告和内存对比"""
+    buildings = syntheticBuildings(numberOfBuilding, seed)
+    binY, binX = gridBins(116, 117, 39, 40, 120)
+    binZ = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 400]
+    gridArea = gridCellArea(binY, binX)
+    compact = Buildings.fromArrays(buildings.toArrays()).astype('float32')
+    with np.errstate(divide='ignore', invalid='ignore'):  # 空网格得到 NaN
+        reference = deriveIndicators(aggregateGrid(buildings, binY, binX, binZ, allSumNames), gridArea)
+        result = compactIndicators(deriveIndicators(aggregateGrid(compact, binY, binX, binZ, allSumNames), gridArea))
+
+    def nbytes(items):
+        return sum(item.nbytes for item in items) / 1024 ** 2
+
+    print("compactPrecision  {} 个建筑  属性 {:.1f} MB -> {:.1f} MB  结果 {:.1f} MB -> {:.1f} MB".format(
+        numberOfBuilding, nbytes(buildings.toArrays().values()), nbytes(compact.toArrays().values()),
+        nbytes(reference.values()), nbytes(result.values())))
+    worst = 0
+    for name in reference:
+        valid = np.isfinite(reference[name]) & (reference[name] != 0)
+        relError = np.abs(result[name][valid].astype('float64') / reference[name][valid] - 1).max() if valid.any() else 0
+        worst = max(worst, relError)
+        print("    {:<7} {:<8} 最大相对误差 {:.2e}".format(name, result[name].dtype.name, relError))
+    assert worst < 1e-4, "紧凑精度误差超出容差"
+    return worst
+
+
+def aggregateGridReference(buildings, binY, binX, binZ):  # 逐统计量调用 binned_statistic 的对照实现
+    lon, lat, height, area = buildings.centroid[:, 0], buildings.centroid[:, 1], buildings.height, buildings.area
+
+    def gridSum(values, statistic='sum'):
+        return stats.binned_statistic_2d(lat, lon, values, statistic=statistic, bins=[binY, binX])[0]
+
+    proj4Area = buildings.proj4Length * height.reshape(-1, 1)
+    return {
+        'count': gridSum(height, 'count'),
+        'sumHeight': gridSum(height),
+        'sumSqHeight': gridSum(height ** 2),
+        'area': gridSum(area),
+        'volume': gridSum(area * height),
+        'wallArea': gridSum(area + buildings.perimeter * height),
+        'frontal': np.stack([gridSum(proj4Area[:, i]) for i in range(4)]),
+        'dh': stats.binned_statistic_dd([height, lat, lon], height, statistic='count', bins=[binZ, binY, binX])[0],
+    }
+
+
+def benchGridAggregate(numberOfBuilding=500000, seed=0):
+    """单次 bincount 网格统计与逐统计量 binned_statistic 的对照（含恰好落在网格边界上的建筑）"""
+    buildings = syntheticBuildings(numberOfBuilding, seed)
+    binY, binX = gridBins(116, 117, 39, 40, 120)
+    binZ = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 400]
+    buildings.centroid[:1000] = np.round(buildings.centroid[:1000] * 120) / 120  # 落在网格线上
+    buildings.centroid[:4] = [[117, 40], [116, 39], [117, 39.5], [117.001, 40]]  # 最右/最上边界和范围外
+    buildings.height[:100] = np.array(binZ)[np.arange(100) % len(binZ)]  # 落在高度区间边界上
+    reference, tReference = timeIt(aggregateGridReference, buildings, binY, binX, binZ)
+    result, tResult = timeIt(aggregateGrid, buildings, binY, binX, binZ)
+    maxError = max(np.abs(result[name] - reference[name]).max() / max(np.abs(reference[name]).max(), 1)
+                   for name in reference)
+    # 高度标准差：与 binned_statistic 的 std 对照；每个网格内高度全部相同时应恰好为 0（E[h²]−E[h]² 相减抵消）
+    lon, lat = buildings.centroid[:, 0], buildings.centroid[:, 1]
+    with np.errstate(divide='ignore', invalid='ignore'):  # 没有建筑的网格为 NaN
+        stdh = deriveIndicators(result, 1.0, ('stdh',))['stdh']
+        stdError = np.nanmax(np.abs(stdh - stats.binned_statistic_2d(lat, lon, buildings.height, 'std',
+                                                                      bins=[binY, binX])[0]))
+        buildings.height = 3 + (cellIndex(buildings, binY, binX) % 97) * 0.7
+        equal = aggregateGrid(buildings, binY, binX, binZ, ('count', 'sumHeight', 'sumSqHeight'))
+        equalStdh = deriveIndicators(equal, 1.0, ('stdh',))['stdh']
+        naive = np.sqrt(np.maximum(equal['sumSqHeight'] / equal['count'] -
+                                   (equal['sumHeight'] / equal['count']) ** 2, 0))
+    print("gridAggregate  {} 个建筑  binned_statistic {:.3f}s  bincount {:.3f}s  加速 {:.1f}x  最大相对误差 {:.2e}  "
+          "stdh 误差 {:.1e}  高度相同的网格 stdh 最大 {:.1e}（直接相减 {:.1e}）".format(
+              numberOfBuilding, tReference, tResult, tReference / tResult, maxError, stdError, np.nanmax(equalStdh),
+              np.nanmax(naive)))
+    assert maxError < 1e-12, "bincount 网格统计与 binned_statistic 不一致"
+    assert stdError < 1e-6 and np.nanmax(equalStdh) == 0, "高度标准差与对照不一致或高度相同时不为 0"
+    return maxError
+
+
+def benchSparseGrid(numberOfBuilding=500000, degrees=10, numberOfCity=20, seed=0):
+    """大范围稀疏分布（若干城市）的稠密与稀疏网格统计对照：统计结果内存和逐窗口还原后的一致性"""
+    rng = np.random.default_rng(seed)
+    buildings = syntheticBuildings(numberOfBuilding, seed)
+    cityCenter = rng.uniform(0.5, degrees - 0.5, (numberOfCity, 2))
+    buildings.centroid = np.array([100, 30]) + cityCenter[rng.integers(0, numberOfCity, numberOfBuilding)] + \
+        rng.normal(0, 0.1, (numberOfBuilding, 2))
+    binY, binX = gridBins(100, 100 + degrees, 30, 30 + degrees, 120)
+    binZ = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 400]
+    dense, tDense = timeIt(aggregateGrid, buildings, binY, binX, binZ)
+    table, tSparse = timeIt(aggregateSparse, buildings, binY, binX, binZ)
+    maxError = 0
+    for rowStart, rowStop in iterWindows(len(binY) - 1):
+        window = denseWindow(table, len(binX) - 1, rowStart, rowStop)
+        for name, value in window.items():
+            maxError = max(maxError, np.abs(value - dense[name][..., rowStart:rowStop, :]).max())
+    denseBytes = sum(value.nbytes for value in dense.values()) / 1024 ** 2
+    sparseBytes = sum(value.nbytes for value in table.values()) / 1024 ** 2
+    print("sparseGrid  {} 个建筑  {}°×{}° 共 {} 个网格，有建筑 {} 个  稠密 {:.0f} MB {:.3f}s  稀疏 {:.1f} MB {:.3f}s  "
+          "最大误差 {:.1e}".format(numberOfBuilding, degrees, degrees, (len(binY) - 1) * (len(binX) - 1),
+                               len(table['cells']), denseBytes, tDense, sparseBytes, tSparse, maxError))
+    assert maxError == 0, "稀疏统计逐窗口还原后与稠密统计不一致"
+    return sparseBytes / denseBytes
+
+
+def benchDhHistogram(numberOfBuilding=500000, seed=0):
+    """
+    高度分布：网格序号按步长换算（经纬网格等间距）+ 单次 bincount 的整型直方图与 binned_statistic_dd 的对照
+    （耗时和结果大小，Numba 内核先调用一次，不计加载时间）
+    """
+    buildings = syntheticBuildings(numberOfBuilding, seed)
+    binY, binX = gridBins(116, 117, 39, 40, 120)
+    binZ = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 400]
+    lon, lat, height = buildings.centroid[:, 0], buildings.centroid[:, 1], buildings.height
+    cumulative = dhHistogram(aggregateGrid(buildings, binY, binX, binZ, ('dh',))['dh'], cumulative=True)
+    reference, tReference = timeIt(lambda: stats.binned_statistic_dd(
+        [height, lat, lon], height, statistic='count', bins=[binZ, binY, binX])[0])
+    result, tResult = timeIt(lambda: dhHistogram(aggregateGrid(buildings, binY, binX, binZ, ('dh',))['dh']))
+    print("dhHistogram  {} 个建筑  binned_statistic_dd {:.3f}s {:.1f} MB  bincount {:.3f}s {:.1f} MB ({})  加速 {:.1f}x".format(
+        numberOfBuilding, tReference, reference.nbytes / 1024 ** 2, tResult, result.nbytes / 1024 ** 2,
+        result.dtype.name, tReference / tResult))
+    assert (result == reference).all() and (cumulative == np.cumsum(reference, axis=0)).all(), "高度分布与对照不一致"
+    assert tReference / tResult > 1.2 and result.nbytes < reference.nbytes, "高度分布没有明显快于对照或没有减小结果"
+    return tReference / tResult
+
+
+def benchPyramid(numberOfBuilding=500000, degrees=2, resolutions=(120, 60, 24, 12), seed=0):
+    """多分辨率输出：最细网格统计一次后按块相加，与每个分辨率重新统计的对照（稠密和稀疏）"""
+    buildings = syntheticBuildings(numberOfBuilding, seed)
+    buildings.centroid = buildings.centroid * degrees - np.array([116, 39]) * (degrees - 1)
+    binZ = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 400]
+    levels = pyramidFactors(max(resolutions), resolutions)
+
+    def reaggregate():
+        return [aggregateGrid(buildings, *gridBins(116, 116 + degrees, 39, 39 + degrees, resolution), binZ)
+                for resolution, _ in levels]
+
+    def pyramid():
+        finest = aggregateGrid(buildings, *gridBins(116, 116 + degrees, 39, 39 + degrees, max(resolutions)), binZ)
+        return [coarsenAggregates(finest, factor) for _, factor in levels]
+
+    def sparsePyramid():
+        binY, binX = gridBins(116, 116 + degrees, 39, 39 + degrees, max(resolutions))
+        finest = aggregateSparse(buildings, binY, binX, binZ)
+        return [coarsenSparse(finest, len(binX) - 1, factor) for _, factor in levels]
+
+    reference, tReference = timeIt(reaggregate)
+    result, tResult = timeIt(pyramid)
+    tables, tSparse = timeIt(sparsePyramid)
+    maxError = 0
+    for (resolution, _), expected, value, table in zip(levels, reference, result, tables):
+        window = denseWindow(table, degrees * resolution, 0, degrees * resolution)
+        for name in expected:
+            scale = np.maximum(np.abs(expected[name]), 1)
+            maxError = max(maxError, (np.abs(value[name] - expected[name]) / scale).max(),
+                           (np.abs(window[name] - expected[name]) / scale).max())
+    print("pyramid  {} 个建筑  {} 级 {}  逐级重新统计 {:.3f}s  一次统计后按块相加 {:.3f}s（稀疏 {:.3f}s）  "
+          "最大相对误差 {:.1e}".format(numberOfBuilding, len(levels), [resolution for resolution, _ in levels],
+                                   tReference, tResult, tSparse, maxError))
+    assert maxError < 1e-9, "按块相加的统计量与逐级重新统计不一致"
+    return tReference / tResult
+
+
+def syntheticRectangles(numberOfBuilding=300000, seed=0, lon0=116.25, lat0=39.25, extent=0.5):
+    """随机旋转的矩形建筑（经纬度，边长约 10~50 m），返回带顶点、高度、面积和中心点的 Buildings"""
+    rng = np.random.default_rng(seed)
+    center = np.array([lon0, lat0]) + rng.uniform(0, extent, (numberOfBuilding, 2))
+    half = rng.uniform(5e-5, 2.5e-4, (numberOfBuilding, 2))
+    angle = rng.uniform(0, np.pi, numberOfBuilding)
+    corner = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]])
+    local = corner[np.newaxis] * half[:, np.newaxis]
+    cos, sin = np.cos(angle)[:, np.newaxis], np.sin(angle)[:, np.newaxis]
+    coords = center[:, np.newaxis] + np.stack([local[..., 0] * cos - local[..., 1] * sin,
+                                               local[..., 0] * sin + local[..., 1] * cos], axis=-1)
+    buildings = Buildings(coords.reshape(-1, 2), np.arange(numberOfBuilding + 1) * 4,
+                          rng.gamma(2.0, 8.0, numberOfBuilding) + 1)
+    buildings.proj4Length = rng.uniform(5, 60, (numberOfBuilding, 4))
+    buildings.projLength = rng.uniform(5, 60, (numberOfBuilding, 16))
+    buildings.perimeter = rng.uniform(20, 200, numberOfBuilding)
+    return buildings
+
+
+def benchApportion(numberOfBuilding=300000, seed=0):
+    """精确占地分摊与按中心点统计的对照：耗时（含几何构建和面积计算）、跨网格建筑比例和面积守恒"""
+    buildings = syntheticRectangles(numberOfBuilding, seed)
+    binY, binX = gridBins(116, 117, 39, 40, 120)
+    binZ = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 400]
+
+    def centroidMode():
+        buildings.area, _, buildings.centroid = polygonMetrics(buildPolygons(buildings.coords, buildings.offsets))
+        return aggregateGrid(buildings, binY, binX, binZ)
+
+    def exactMode():
+        buildings.pieceCount, buildings.pieceCenter, buildings.pieceFraction = \
+            footprintPieces(buildings.coords, buildings.offsets, 120)
+        return centroidMode()
+
+    centroid, tCentroid = timeIt(centroidMode)
+    exact, tExact = timeIt(exactMode)
+    crossing = (buildings.pieceCount > 0).mean()
+    fractionError = np.abs(np.bincount(np.repeat(np.arange(numberOfBuilding), buildings.pieceCount),
+                                       weights=buildings.pieceFraction, minlength=numberOfBuilding)
+                           [buildings.pieceCount > 0] - 1).max()
+    areaError = abs(exact['area'].sum() / centroid['area'].sum() - 1)
+    changed = (~np.isclose(exact['area'], centroid['area'])).mean()
+    print("apportion  {} 个建筑  跨网格 {:.1%}  按中心点 {:.3f}s  精确分摊 {:.3f}s（{:.2f}x）  面积改变的网格 {:.1%}  "
+          "比例和误差 {:.1e}  总面积误差 {:.1e}".format(numberOfBuilding, crossing, tCentroid, tExact,
+                                               tExact / tCentroid, changed, fractionError, areaError))
+    assert fractionError < 1e-9 and areaError < 1e-9, "精确分摊的面积不守恒"
+    assert (exact['count'] == centroid['count']).all(), "精确分摊不应改变按中心点统计的数量"
+    assert tExact / tCentroid < 3, "精确分摊耗时超过按中心点统计的3倍"
+    return tExact / tCentroid
+
+
+def compareKernel(name, numpyKernel, numbaKernel, args, size):
+    """同一内核 NumPy 实现与 Numba 实现的耗时和结果对照（Numba 先调用一次，不计编译时间）"""
+    if kernels.njit is None:
+        print("{}  未安装 numba，只有 NumPy 实现".format(name))
+        return None
+    start = time.perf_counter()
+    numbaKernel(*args)
+    tCompile = time.perf_counter() - start
+    reference, tNumPy = timeIt(numpyKernel, *args)
+    result, tNumba = timeIt(numbaKernel, *args)
+    maxError = np.abs(np.asarray(result, dtype='float64') - np.asarray(reference, dtype='float64')).max()
+    print("{}  {}  NumPy {:.4f}s  Numba {:.4f}s（首次调用含编译 {:.2f}s）  加速 {:.1f}x  最大误差 {:.1e}".format(
+        name, size, tNumPy, tNumba, tCompile, tNumPy / tNumba, maxError))
+    return maxError, tNumPy / tNumba
+
+
+def benchKernelProjection(numberOfBuilding=500000, vertexCount=12, seed=0):
+    """投影宽度内核：扁平顶点按建筑分段、在四个方向上求投影的最大值 - 最小值"""
+    rng = np.random.default_rng(seed)
+    offsets = np.arange(numberOfBuilding + 1) * vertexCount
+    center = rng.uniform([3e5, 4e6], [7e5, 5e6], (numberOfBuilding, 2))
+    coords = np.repeat(center, vertexCount, axis=0) + rng.normal(0, 10, (len(offsets[:-1]) * vertexCount, 2))
+    maxError, _ = compareKernel('kernelProjection', kernels.projectionRangeNumPy, kernels.projectionRangeNumba,
+                                (coords[:, 0].copy(), coords[:, 1].copy(), offsets, proj4Directions),
+                                '{} 个建筑 × {} 个顶点'.format(numberOfBuilding, vertexCount)) or (0, None)
+    assert maxError < 1e-6, "投影宽度内核与 NumPy 实现不一致"
+
+
+def benchKernelSearchBins(numberOfPoint=5000000, seed=0):
+    """
+    区间查找内核：中心点经度所在的网格列（1/120°）；等间距边界按步长换算（uniformBins）与逐区间查找的对照，
+    含恰好落在边界和边界两侧相邻浮点数上的值、范围外的值和 NaN
+    """
+    values = np.random.default_rng(seed).uniform(116, 117, numberOfPoint)
+    edges = np.linspace(116, 117, 121)
+    maxError, _ = compareKernel('kernelSearchBins', kernels.searchBinsNumPy, kernels.searchBinsNumba, (values, edges),
+                                '{} 个点'.format(numberOfPoint)) or (0, None)
+    special = np.concatenate([edges, np.nextafter(edges, -np.inf), np.nextafter(edges, np.inf),
+                              [115.5, 117.5, np.nan, np.inf, -np.inf]])
+    for sample in (np.concatenate([values, special]), special.astype('float32')):
+        reference, tSearch = timeIt(kernels.searchBinsNumPy, sample, edges)
+        result, tUniform = timeIt(uniformBins, sample, edges)
+        mismatch = int((result != reference).sum())
+        print("uniformBins  {} 个值 ({})  逐区间查找 {:.4f}s  按步长换算 {:.4f}s  不一致 {}".format(
+            len(sample), sample.dtype.name, tSearch, tUniform, mismatch))
+        assert mismatch == 0, "等间距边界按步长换算与逐区间查找不一致"
+
+
+def benchKernelDhCount(numberOfBuilding=5000000, size=120 * 120, nz=15, seed=0):
+    """高度分布计数内核：(高度区间, 网格) 二维计数"""
+    rng = np.random.default_rng(seed)
+    row, col = rng.integers(0, nz, numberOfBuilding), rng.integers(0, size, numberOfBuilding)
+    maxError, _ = compareKernel('kernelDhCount', kernels.binCount2dNumPy, kernels.binCount2dNumba,
+                                (row, col, nz, size), '{} 个建筑'.format(numberOfBuilding)) or (0, None)
+    assert maxError == 0, "高度分布计数内核与 NumPy 实现不一致"
+
+
+def shareEdgeCountByLoop(array, value):  # 原 AI.get_share_edge 的逐像元循环实现，作为对照
+    binaryPad = np.pad((array == value).astype(np.int8), 1, mode='constant', constant_values=0)
+    template = np.array([[0, 0, 0], [0, 0, 1], [0, 1, 0]])
+    count = 0
+    for i in range(1, binaryPad.shape[0] - 1):
+        for j in range(1, binaryPad.shape[1] - 1):
+            if binaryPad[i, j] == 1:
+                count += np.sum(binaryPad[i - 1:i + 2, j - 1:j + 2] * template)
+    return count
+
+
+def benchKernelShareEdge(shape=(4000, 4000), loopShape=(200, 200), classes=5, seed=0):
+    """聚集指数公共边计数内核（AI.get_share_edge），并与原逐像元循环在小数组上对照"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, classes, loopShape)
+    kernels.shareEdgeCount(small, 1)  # 不计编译时间
+    reference, tLoop = timeIt(shareEdgeCountByLoop, small, 1)
+    result, tVectorized = timeIt(kernels.shareEdgeCount, small, 1)
+    print("kernelShareEdge  {}×{} 像元  原逐像元循环 {:.3f}s  当前实现 {:.5f}s  加速 {:.0f}x".format(
+        loopShape[0], loopShape[1], tLoop, tVectorized, tLoop / tVectorized))
+    assert result == reference, "公共边计数与原实现不一致"
+    array = rng.integers(0, classes, shape)
+    maxError, _ = compareKernel('kernelShareEdge', kernels.shareEdgeCountNumPy, kernels.shareEdgeCountNumba,
+                                (array, 1), '{}×{} 像元'.format(*shape)) or (0, None)
+    assert maxError == 0, "公共边计数内核与 NumPy 实现不一致"
+
+
+def gridCellAreaByUtm(latList, lonList):  # 原实现：逐网格把四个角点投影到中心所在UTM分带后求多边形面积
+    gridTotalArea = np.zeros((len(latList) - 1, len(lonList) - 1))
+    for latIndex, (startLat, endLat) in enumerate(zip(latList[:-1], latList[1:])):
+        for lonIndex, (startLon, endLon) in enumerate(zip(lonList[:-1], lonList[1:])):
+            zone = int(((startLon + endLon) / 2 + 180) / 6) + 1
+            hemisphere = 'south' if (startLat + endLat) / 2 < 0 else 'north'
+            corners = [utmTransformers[(zone, hemisphere)].transform(lon, lat) for lon, lat in
+                       [(startLon, startLat), (startLon, endLat), (endLon, endLat), (endLon, startLat)]]
+            gridTotalArea[latIndex, lonIndex] = shapely.Polygon(corners).area
+    return gridTotalArea
+
+
+def benchCellArea(degrees=1, numberOfEachDegree=120, lon0=118.0, lat0=31.0):
+    """解析的椭球面纬度带网格面积与逐网格UTM投影求面积的对照（以大地线多边形面积为准）"""
+    lonList = np.linspace(lon0, lon0 + degrees, degrees * numberOfEachDegree + 1)
+    latList = np.linspace(lat0, lat0 + degrees, degrees * numberOfEachDegree + 1)
+    reference, tReference = timeIt(gridCellAreaByUtm, latList, lonList)
+    ellipsoidRowArea.cache_clear()
+    result, tResult = timeIt(gridCellArea, latList, lonList)
+    _, tCached = timeIt(gridCellArea, latList, lonList)
+    geodArea = np.array([abs(geod.polygon_area_perimeter([lon0, lonList[1], lonList[1], lon0],
+                                                         [startLat, startLat, endLat, endLat])[0])
+                         for startLat, endLat in zip(latList[:-1], latList[1:])])
+    error = np.abs(result[:, 0] / geodArea - 1).max()
+    utmError = np.abs(reference / geodArea.reshape(-1, 1) - 1).max()
+    print("cellArea  {} 个网格  逐网格UTM {:.3f}s  解析 {:.5f}s（缓存 {:.6f}s）  加速 {:.0f}x  "
+          "相对误差（对大地线）UTM {:.2e}  解析 {:.2e}".format(result.size, tReference, tResult, tCached,
+                                                     tReference / tResult, utmError, error))
+    assert error < 1e-6, "解析网格面积误差过大"
+    return error
+
+
+def benchMetricGrid(numberOfBuilding=2000000, cellSize=250, seed=0):
+    """投影米制网格：中心点按网格边长整数换算网格序号，与按区间查找（digitize）的对照，以及与经纬网格统计的耗时对比"""
+    buildings = syntheticBuildings(numberOfBuilding, seed)
+    centroid = buildings.centroid
+    crs = metricGridCrs(None, (116, 39, 117, 40))
+    points = projectPoints(centroid, crs)
+    binY, binX = metricBins(np.concatenate([points.min(axis=0), points.max(axis=0)]), cellSize)
+    reference, tReference = timeIt(pointCellIndex, points, binY, binX)
+    cell, tCell = timeIt(metricCellIndex, points, binY, binX)
+    binZ = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 400]
+    degreeBinY, degreeBinX = gridBins(116, 117, 39, 40, 120)
+
+    def degreeGrid():  # 经纬网格：逐区间查找网格序号并计算每个纬度带的网格面积
+        sums = aggregateGrid(buildings, degreeBinY, degreeBinX, binZ)
+        return deriveIndicators(sums, gridCellArea(degreeBinY, degreeBinX), ('lp', 'lb'))
+
+    def metricGrid():  # 投影网格：网格序号整数换算，网格面积为常数
+        sums = aggregateGrid(buildings, binY, binX, binZ, cell=metricCellIndex(points, binY, binX))
+        return deriveIndicators(sums, float(cellSize) ** 2, ('lp', 'lb'))
+
+    _, tDegree = timeIt(degreeGrid)
+    metric, tMetric = timeIt(metricGrid)
+    mismatch = int((cell != reference).sum())
+    print("metricGrid  {} 个建筑  {}m 网格 {}×{}  网格序号 查找 {:.3f}s 整数换算 {:.3f}s 加速 {:.1f}x 不一致 {}  "
+          "统计+推导 经纬网格 {:.3f}s 投影网格 {:.3f}s".format(numberOfBuilding, cellSize, len(binY) - 1, len(binX) - 1,
+                                                       tReference, tCell, tReference / tCell, mismatch, tDegree,
+                                                       tMetric))
+    assert mismatch == 0 and np.isclose(np.nansum(metric['lp']) * cellSize ** 2, buildings.area.sum()), \
+        "投影网格序号或面积不一致"
+    return mismatch
+
+
+def benchZonal(numberOfZone=100000, numberOfBuilding=3000000, seed=0):
+    """分区统计：Voronoi 分区（1°范围内）上 STRtree 批量点面查询归属中心点，再用网格的统计量推导参数"""
+    rng = np.random.default_rng(seed)
+    buildings = syntheticBuildings(numberOfBuilding, seed)
+    seeds = shapely.multipoints(np.column_stack([116 + rng.random(numberOfZone), 39 + rng.random(numberOfZone)]))
+    zones = shapely.get_parts(shapely.voronoi_polygons(seeds, extend_to=shapely.box(116, 39, 117, 40)))
+    zones = shapely.intersection(zones, shapely.box(116, 39, 117, 40))
+    tree, tTree = timeIt(shapely.STRtree, zones)
+    zone, tAssign = timeIt(assignZones, buildings.centroid, tree)
+    binZ = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 400]
+    sums, tSums = timeIt(aggregateCells, buildings, zone, len(zones), binZ)
+    area, tArea = timeIt(zoneAreas, zones)
+    with np.errstate(divide='ignore', invalid='ignore'):  # 没有建筑的分区比值为 NaN
+        _, tDerive = timeIt(deriveIndicators, sums, area)
+    inside = shapely.intersects(zones[zone[zone >= 0]], shapely.points(buildings.centroid[zone >= 0]))
+    print("zonal  {} 个分区 {} 个建筑  索引 {:.2f}s  归属 {:.2f}s  统计 {:.2f}s  分区面积 {:.2f}s  推导 {:.2f}s  "
+          "分区外 {}  归属错误 {}".format(numberOfZone, numberOfBuilding, tTree, tAssign, tSums, tArea, tDerive,
+                                     int((zone < 0).sum()), int((~inside).sum())))
+    assert inside.all() and sums['count'].sum() == (zone >= 0).sum(), "分区归属不一致"
+    return int((~inside).sum())
+
+
+def benchFrontalN(numberOfPolygon=200000, maxVertex=12, sectors=36, size=120 * 120, seed=0):
+    """
+    多风向峰向指数：逐风向循环（每个风向单独求投影宽度并单独累加到网格）与一次矩阵乘积 + 稀疏矩阵累加的对照；
+    风向取 0/90/45/135 时与四方向的 proj4Length 一致
+    """
+    rng = np.random.default_rng(seed)
+    geoCoords, offsets = flattenFootprints(randomFootprints(numberOfPolygon, maxVertex, seed))
+    projCoords = projectPoints(geoCoords, metricGridCrs(None, (115.8, 39.4, 116.8, 40.4)))
+    angles = np.arange(sectors) * 360 / sectors
+    buildings = Buildings(None, offsets, rng.gamma(2.0, 8.0, numberOfPolygon) + 1)
+    cell = rng.integers(-1, size, numberOfPolygon)
+
+    def loop():  # 逐风向：k 次投影宽度 + k 次按网格累加
+        frontal = np.empty((sectors, size))
+        for d, angle in enumerate(angles):
+            length = calcu4ProjLengthRagged(projCoords, offsets, directions=frontalDirections([angle]))[:, 0]
+            inside = cell >= 0
+            frontal[d] = np.bincount(cell[inside], weights=(length * buildings.height)[inside], minlength=size)
+        return frontal
+
+    def vectorized():  # 一次矩阵乘积得到 (N, k) 投影宽度，一次稀疏矩阵乘积得到 (k, size) 迎风面积
+        buildings.projLength = calcuProjLengthByAngles(projCoords, offsets, angles)
+        return aggregateCells(buildings, cell, size, [0, 400], ('frontalN',))['frontalN']
+
+    reference, tLoop = timeIt(loop)
+    result, tVectorized = timeIt(vectorized)
+    relError = np.abs(result - reference).max() / reference.max()
+    four = calcuProjLengthByAngles(projCoords, offsets, [0, 90, 45, 135])
+    fourError = np.abs(four - calcu4ProjLengthRagged(projCoords, offsets)).max()
+    print("frontalN  {} 个建筑 {} 个风向 {} 个网格  逐风向循环 {:.3f}s  一次计算 {:.3f}s  加速 {:.1f}x  "
+          "最大相对误差 {:.2e}  四方向误差 {:.2e} m".format(numberOfPolygon, sectors, size, tLoop, tVectorized,
+                                                  tLoop / tVectorized, relError, fourError))
+    assert relError < 1e-12 and fourError < 1e-9, "多风向迎风面积与逐风向实现不一致"
+    assert tLoop / tVectorized > 1.5, "一次计算没有明显快于逐风向循环"
+    return relError
+
+
+def benchCogOutput(numberOfBuilding=1000000, degrees=4, numberOfCity=6, seed=0):
+    """
+    结果写出：每个参数一个未压缩 float64 GeoTIFF 与全部参数一个多波段 COG（float32，ZSTD + 预测器）的
+    文件大小和写出耗时对比（本地缓存写入时未压缩文件几乎不耗时，存储带宽受限时文件大小决定写出时间）
+    """
+    rng = np.random.default_rng(seed)
+    buildings = syntheticBuildings(numberOfBuilding, seed)
+    cityCenter = rng.uniform(0.5, degrees - 0.5, (numberOfCity, 2))
+    buildings.centroid = np.array([100, 30]) + cityCenter[rng.integers(0, numberOfCity, numberOfBuilding)] + \
+        rng.normal(0, 0.15, (numberOfBuilding, 2))
+    binY, binX = gridBins(100, 100 + degrees, 30, 30 + degrees, 120)
+    binZ = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 400]
+    options = ['count', 'sum', 'area', 'volume', 'mh', 'stdh', 'haw', 'lb', 'lp', 'lf0', 'lf45', 'lf90', 'lf135', 'dh']
+    with np.errstate(divide='ignore', invalid='ignore'):  # 没有建筑的网格比值为 NaN
+        indicators = deriveIndicators(aggregateGrid(buildings, binY, binX, binZ), gridCellArea(binY, binX), options)
+    transform = from_origin(100, 30, 1 / 120, -1 / 120)
+    counts = {option: len(indicators[option]) if indicators[option].ndim == 3 else 1 for option in options}
+    folder = tempfile.mkdtemp()
+
+    def separate():  # 原方式：每个参数一个 GeoTIFF
+        paths = [os.path.join(folder, option + '.tif') for option in options]
+        for option, path in zip(options, paths):
+            value = indicators[option] if indicators[option].ndim == 3 else indicators[option][np.newaxis]
+            with rasterio.open(path, 'w', height=value.shape[1], width=value.shape[2], count=value.shape[0],
+                               dtype=value.dtype.name, crs='EPSG:4326', transform=transform) as dst:
+                dst.write(value)
+        return paths
+
+    def stack():  # 全部参数一个多波段 GeoTIFF，再转换为 COG
+        path = os.path.join(folder, 'UCP.tif')
+        targets = openStack(path, counts, len(binY) - 1, len(binX) - 1, 'float32', 'EPSG:4326', transform)
+        try:
+            writeTargets(targets, indicators)
+        finally:
+            closeTargets(targets)
+        return convertToCog(path, [name for option in options for name in bandNames(option, binZ, ())])
+
+    paths, tSeparate = timeIt(separate)
+    path, tStack = timeIt(stack)
+    separateBytes, stackBytes = sum(os.path.getsize(item) for item in paths), os.path.getsize(path)
+    with rasterio.open(path) as src:
+        result = src.read()
+    reference = np.concatenate([indicators[option].astype('float32').reshape(-1, len(binY) - 1, len(binX) - 1)
+                                for option in options])
+    same = np.array_equal(result, reference, equal_nan=True)
+    shutil.rmtree(folder)
+    print("cogOutput  {} 个网格 {} 个波段  分参数 {:.1f} MB {:.3f}s  COG {:.2f} MB {:.3f}s  缩小 {:.1f}x  "
+          "与 float32 结果一致 {}".format(result.shape[1] * result.shape[2], len(result), separateBytes / 1024 ** 2,
+                                     tSeparate, stackBytes / 1024 ** 2, tStack, separateBytes / stackBytes, same))
+    assert same, "COG 结果与 float32 参数不一致"
+    return separateBytes / stackBytes
+
+
+benchmarks = {
+    'projLength': benchProjLength,
+    'projLengthRagged': benchProjLengthRagged,
+    'localProjection': benchLocalProjection,
+    'reader': benchReader,
+    'shard': benchShard,
+    'compactPrecision': benchCompactPrecision,
+    'gridAggregate': benchGridAggregate,
+    'sparseGrid': benchSparseGrid,
+    'dhHistogram': benchDhHistogram,
+    'cellArea': benchCellArea,
+    'pyramid': benchPyramid,
+    'apportion': benchApportion,
+    'kernelProjection': benchKernelProjection,
+    'kernelSearchBins': benchKernelSearchBins,
+    'kernelDhCount': benchKernelDhCount,
+    'kernelShareEdge': benchKernelShareEdge,
+    'metricGrid': benchMetricGrid,
+    'zonal': benchZonal,
+    'frontalN': benchFrontalN,
+    'cogOutput': benchCogOutput,
+}
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or benchmarks:
+        benchmarks[name]()
@@ -0,0 +1,134 @@
+# coding=utf-8
+
+import numpy as np
+import shapely
+
+
+def buildPolygons(projCoords, offsets):  # 由扁平顶点和偏移一次性构建全部建筑的几何数组（Shapely 2）
+    ringIndex = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    return shapely.polygons(shapely.linearrings(projCoords, indices=ringIndex))
+
+
+def polygonMetrics(polygons):
+    """
+    向量化计算几何数组的面积、周长和中心点（投影坐标）。
+
+    返回:
+    area (np.ndarray): (N,) 面积。
+    perimeter (np.ndarray): (N,) 周长。
+    centroid (np.ndarray): (N, 2) 中心点投影坐标。
+    """
+    area = shapely.area(polygons)
+    perimeter = shapely.length(polygons)
+    centroid = shapely.get_coordinates(shapely.centroid(polygons)).reshape(-1, 2)
+    return area, perimeter, centroid
+
+
+def grow(array, size):  # 按至少翻倍的容量扩展数组（保留已有数据）
+    newArray = np.empty((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+    newArray[:len(array)] = array
+    return newArray
+
+
+class Buildings:
+    """
+    紧凑的建筑数据容器：全部外环顶点扁平存放在一个 (M, 2) float64 数组中，用 offsets 划分每个建筑，
+    其余属性均为长度 N 的数组，避免为每个建筑创建 Python 对象。
+
+    属性:
+    coords (np.ndarray): (M, 2) 外环顶点（不含闭合点），读取缓存时为 None。
+    offsets (np.ndarray): (N+1,) 每个建筑顶点在 coords 中的起止位置。
+    height, area, perimeter (np.ndarray): (N,) 高度、面积、周长。
+    centroid (np.ndarray): (N, 2) 中心点经纬度。
+    proj4Length (np.ndarray): (N, 4) 四个方向上的投影长度。
+    projLength (np.ndarray): (N, k) 可配置的 k 个风向上的投影长度（见 computation.frontal.calcuProjLengthByAngles）。
+    pieceCount, pieceCenter, pieceFraction: 精确占地分摊时跨网格建筑的拆分（见 computation.apportion），
+                                          后两者按部分排列（长度为部分总数）。
+    rejected (dict): 读取和筛选阶段按原因剔除的建筑数量（见 computation.quality）。
+    """
+    pieceAttributes = ('pieceCount', 'pieceCenter', 'pieceFraction')
+    attributes = ('height', 'area', 'perimeter', 'centroid', 'proj4Length', 'projLength') + pieceAttributes
+
+    def __init__(self, coords, offsets, height):
+        self.coords = coords
+        self.offsets = np.asarray(offsets, dtype='int64')
+        self.height = np.asarray(height, dtype='float64')
+        self.area = self.perimeter = self.centroid = self.proj4Length = self.projLength = None
+        self.pieceCount = self.pieceCenter = self.pieceFraction = None
+        self.rejected = None
+        self._size = len(self.offsets) - 1
+
+    def __len__(self):
+        return self._size
+
+    @classmethod
+    def allocate(cls, capacity=1024, vertexCapacity=None):  # 预分配空容器，之后用 appendRing 逐个追加
+        buildings = cls(np.empty((vertexCapacity or capacity * 8, 2)), np.zeros(capacity + 1, dtype='int64'),
+                        np.empty(capacity))
+        buildings._size = 0
+        return buildings
+
+    def appendRing(self, ring, height):  # 追加一个建筑外环，容量不足时翻倍
+        start = self.offsets[self._size]
+        end = start + len(ring)
+        if end > len(self.coords):
+            self.coords = grow(self.coords, end)
+        if self._size + 1 >= len(self.offsets):
+            self.offsets = grow(self.offsets, self._size + 2)
+            self.height = grow(self.height, self._size + 1)
+        self.coords[start:end] = ring
+        self.height[self._size] = height
+        self._size += 1
+        self.offsets[self._size] = end
+
+    def compact(self):  # 截去预分配的多余空间
+        self.offsets = self.offsets[:self._size + 1]
+        self.height = self.height[:self._size]
+        if self.coords is not None:
+            self.coords = self.coords[:self.offsets[-1]]
+        return self
+
+    def vertexCounts(self):
+        return np.diff(self.offsets)
+
+    def select(self, mask):
+        """按布尔掩膜保留部分建筑，顶点与全部已有属性同步筛选，返回新的容器（占地分摊需在筛选后重新计算）"""
+        mask = np.asarray(mask, dtype='bool')
+        counts = self.vertexCounts()[mask]
+        offsets = np.zeros(len(counts) + 1, dtype='int64')
+        offsets[1:] = np.cumsum(counts)
+        coords = None if self.coords is None else self.coords[np.repeat(mask, self.vertexCounts())]
+        subset = Buildings(coords, offsets, self.height[mask])
+        for name in self.attributes[1:]:
+            value = None if name in self.pieceAttributes else getattr(self, name)
+            setattr(subset, name, None if value is None else value[mask])
+        return subset
+
+    def toArrays(self):  # 已计算的派生属性 -> {字段: 数组}，用于写入缓存（不含顶点）
+        return {name: getattr(self, name) for name in self.attributes if getattr(self, name) is not None}
+
+    @classmethod
+    def fromArrays(cls, arrays):  # 由缓存恢复（没有顶点，只保留派生属性，保持缓存中的精度）
+        buildings = cls(None, np.zeros(len(arrays['height']) + 1, dtype='int64'), arrays['height'])
+        for name in cls.attributes:
+            setattr(buildings, name, arrays.get(name))
+        return buildings
+
+    def astype(self, dtype):  # 转换派生属性的精度（中心点经纬度保持 float64，避免网格归属改变）
+        for name in ('height', 'area', 'perimeter', 'proj4Length', 'projLength'):
+            value = getattr(self, name)
+            if value is not None:
+                setattr(self, name, value.astype(dtype))
+        return self
+
+    @classmethod
+    def concat(cls, buildingsList):  # 合并多批建筑（只合并顶点和高度）
+        buildingsList = [item.compact() for item in buildingsList]
+        if not buildingsList:
+            return cls(np.empty((0, 2)), np.zeros(1, dtype='int64'), np.empty(0))
+        offsets, base = [np.zeros(1, dtype='int64')], 0
+        for item in buildingsList:
+            offsets.append(item.offsets[1:] + base)
+            base += item.offsets[-1]
+        return cls(np.concatenate([item.coords for item in buildingsList]), np.concatenate(offsets),
+                   np.concatenate([item.height for item in buildingsList]))
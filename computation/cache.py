@@ -0,0 +1,111 @@
+# coding=utf-8
+# 每个输入shp的建筑派生属性缓存（.npz），以 路径 + 文件大小 + 修改时间（可选内容哈希）+ 计算参数 为键
+
+import glob
+import hashlib
+import os
+
+import numpy as np
+
+cacheVersion = 4  # 缓存内容的格式版本，字段变化时加一使旧缓存失效
+shpComponents = ('.shp', '.dbf', '.shx')  # 几何和高度分别来自 .shp 和 .dbf，任一变化都需重新计算
+
+
+def pathDigest(shpFileDir):
+    return hashlib.sha1(os.path.abspath(shpFileDir).lower().encode('utf-8')).hexdigest()[:16]
+
+
+def fileFingerprint(shpFileDir, contentHash=False):  # 文件指纹：各组成文件的大小和修改时间，可选内容哈希
+    fingerprint = []
+    stem = os.path.splitext(shpFileDir)[0]
+    for ext in shpComponents:
+        path = stem + ext
+        if not os.path.exists(path):
+            continue
+        stat = os.stat(path)
+        fingerprint.append((ext, stat.st_size, stat.st_mtime_ns))
+        if contentHash:
+            digest = hashlib.sha1()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            fingerprint.append(digest.hexdigest())
+    return fingerprint
+
+
+def cacheKey(shpFileDir, settings, contentHash=False):
+    """
+    缓存键：<路径摘要>_<状态摘要>。同一路径只保留最新状态的缓存，旧状态在写入时清除。
+
+    参数:
+    settings (dict): 影响派生属性的计算参数（高度字段、筛选阈值等）。
+    """
+    state = repr((cacheVersion, fileFingerprint(shpFileDir, contentHash), sorted(settings.items())))
+    return pathDigest(shpFileDir) + '_' + hashlib.sha1(state.encode('utf-8')).hexdigest()[:16]
+
+
+def loadCache(cacheFolder, key):  # 命中返回 {字段: 数组}，未命中返回 None
+    path = os.path.join(cacheFolder, key + '.npz')
+    try:
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        os.utime(path)  # 更新访问时间，用于按最近使用淘汰
+        return arrays
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def saveCache(cacheFolder, key, arrays, maxBytes=None):
+    os.makedirs(cacheFolder, exist_ok=True)
+    invalidateCache(cacheFolder, key.split('_')[0])  # 同一文件的旧缓存失效
+    path = os.path.join(cacheFolder, key + '.npz')
+    tempPath = path + '.{}.tmp'.format(os.getpid())  # 先写临时文件再替换，避免多进程读到半个文件
+    with open(tempPath, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tempPath, path)
+    if maxBytes is not None:
+        evictCache(cacheFolder, maxBytes)
+    return path
+
+
+def invalidateCache(cacheFolder, shpFileDir=None):
+    """删除某个shp（或其路径摘要）的全部缓存；不传 shpFileDir 时清空缓存文件夹"""
+    if shpFileDir is None:
+        pattern = '*.npz'
+    elif shpFileDir.endswith('.shp'):
+        pattern = pathDigest(shpFileDir) + '_*.npz'
+    else:
+        pattern = shpFileDir + '_*.npz'
+    for path in glob.glob(os.path.join(cacheFolder, pattern)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def evictCache(cacheFolder, maxBytes):
+    """缓存总大小超过 maxBytes 时，按最近使用时间从旧到新删除"""
+    entries = []
+    for path in glob.glob(os.path.join(cacheFolder, '*.npz')):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= maxBytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def cachedFields(cacheFolder, key):  # 缓存中已有的字段名（只读取npz目录，不读取数组），没有缓存时返回空集合
+    try:
+        with np.load(os.path.join(cacheFolder, key + '.npz')) as data:
+            return set(data.files)
+    except (OSError, ValueError):
+        return set()
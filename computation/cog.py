@@ -0,0 +1,62 @@
+# coding=utf-8
+# 多波段 Cloud-Optimized GeoTIFF（COG）输出：每个城市（每个分辨率）一个文件，所选参数按顺序排为波段
+# （dh 每个高度区间一个、λfN 每个风向一个），波段名为参数名，全部波段使用同一数据类型，没有建筑的网格为 NaN。
+# 先写入普通GeoTIFF（稀疏统计逐窗口写出、掩膜提取都在这一步进行），最后一次转换为COG：
+# 分块、压缩（DEFLATE / ZSTD + 浮点预测器），文件头在前，可按块远程读取。
+
+import os
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+
+cogBlockSize = 256  # 分块大小（像元），城市范围的结果通常只有几百行列，较小的分块减少边缘分块的填充
+cogCompressLevel = 1  # 压缩级别：1 最快，级别越高文件越小（ZSTD 默认 9 时约小 5%，耗时约为两倍）
+
+
+def openStack(path, counts, height, width, dtype, crs, transform):
+    """
+    打开多波段GeoTIFF（按波段存放，逐参数、逐窗口写入时不需要读回），返回 {参数: (数据集, 波段序号列表)}。
+
+    参数:
+    counts (dict): {参数: 波段数}，波段顺序与字典顺序一致。
+    """
+    nodata = np.nan if np.dtype(dtype).kind == 'f' else None
+    dst = rasterio.open(path, 'w', driver='GTiff', height=height, width=width, count=sum(counts.values()),
+                        dtype=dtype, nodata=nodata, crs=crs, transform=transform, interleave='band',
+                        BIGTIFF='IF_SAFER')
+    targets, start = {}, 1
+    for option, count in counts.items():
+        targets[option] = (dst, list(range(start, start + count)))
+        start += count
+    return targets
+
+
+def writeTargets(targets, indicators, window=None):  # 各参数写入对应数据集的波段（多波段输出时转换为统一的数据类型）
+    for option, (dst, indexes) in targets.items():
+        value = indicators[option] if indicators[option].ndim == 3 else indicators[option][np.newaxis]
+        dst.write(value.astype(dst.dtypes[0], copy=False), indexes=indexes, window=window)
+
+
+def closeTargets(targets):
+    for dst in {id(dst): dst for dst, _ in targets.values()}.values():
+        dst.close()
+
+
+def convertToCog(path, names, compress='ZSTD', overviews=False):
+    """
+    GeoTIFF 转换为 COG（覆盖原文件）：写入波段名，分块并压缩（PREDICTOR=YES，浮点数据使用浮点预测器）。
+
+    参数:
+    names (list): 各波段名称（掩膜提取重写文件时不保留波段名，这里统一写入）。
+    overviews (bool): 是否生成内部金字塔（最近邻重采样，只用于浏览；各分辨率的参数见 outputResolutions）。
+    """
+    with rasterio.open(path, 'r+') as dst:
+        for index, name in enumerate(names, 1):
+            dst.set_band_description(index, name)
+    temp = os.path.splitext(path)[0] + '_cog.tif'
+    rasterio.shutil.copy(path, temp, driver='COG', COMPRESS=compress, LEVEL=cogCompressLevel, PREDICTOR='YES',
+                         BLOCKSIZE=cogBlockSize, OVERVIEWS='AUTO' if overviews else 'NONE', BIGTIFF='IF_SAFER',
+                         NUM_THREADS='ALL_CPUS')
+    os.replace(temp, path)
+    return path
@@ -0,0 +1,57 @@
+# coding=utf-8
+
+import numpy as np
+
+from computation.kernels import projectionRange
+
+# 四个投影方向的单位向量（列）：fro 0 东西向、fro 90 南北向、fro 45、fro 135
+proj4Directions = np.array([[1, 0, 1 / np.sqrt(2), 1 / np.sqrt(2)],
+                            [0, 1, -1 / np.sqrt(2), 1 / np.sqrt(2)]])
+
+
+def frontalDirections(angles):
+    """
+    风向 angles（度，气象风向：风的来向，从北顺时针）对应的投影方向单位向量 (2, k)：投影方向与风向垂直，
+    即 (cos θ, -sin θ)（x 向东、y 向北）；0° 为东西向、90° 为南北向，与 proj4Directions 的四列一致（符号不影响宽度）。
+    """
+    theta = np.radians(np.asarray(angles, dtype='float64'))
+    return np.stack([np.cos(theta), -np.sin(theta)])
+
+
+def calcuProjLengthByAngles(projCoords, offsets, angles, convergence=None, scale=None):
+    """
+    一次计算全部建筑在任意 k 个风向上的投影长度，返回 (N, k)，列顺序与 angles 相同。
+
+    全部方向的投影是顶点坐标与方向矩阵 (2, k) 的一次矩阵乘积，再按建筑分段求 最大值 - 最小值；
+    相反风向（相差180°）的投影长度相同，只计算一次。参数同 calcu4ProjLengthRagged。
+    """
+    unique, inverse = np.unique(np.mod(np.asarray(angles, dtype='float64'), 180), return_inverse=True)
+    return calcu4ProjLengthRagged(projCoords, offsets, convergence, scale, frontalDirections(unique))[:, inverse]
+
+
+def calcu4ProjLengthRagged(projCoords, offsets, convergence=None, scale=None, directions=proj4Directions):
+    """
+    一次计算全部建筑四个方向上的投影长度，返回 (N, 4)，列顺序为 0/90/45/135（与 proj4Directions 相同）。
+
+    直接使用已投影的平面坐标：某方向的最大投影长度 = 顶点在该方向上投影的最大值 - 最小值，
+    按建筑分段求极值（见 computation.kernels.projectionRange，可选 Numba 加速），不需要逐建筑循环。
+
+    参数:
+    projCoords (np.ndarray): (M, 2) 全部建筑的投影坐标（扁平存放）。
+    offsets (np.ndarray): (N+1,) 每个建筑顶点的起止位置。
+    convergence (np.ndarray): (N,) 子午线收敛角（弧度），用于把格网北转到真北，可选。
+    scale (np.ndarray): (N,) 投影比例因子，用于还原真实长度，可选。
+    directions (np.ndarray): (2, k) 投影方向的单位向量，默认为四个方向（返回 (N, k)）。
+    """
+    offsets = np.asarray(offsets)
+    if len(offsets) < 2:
+        return np.zeros((0, directions.shape[1]))
+    x, y = projCoords[:, 0], projCoords[:, 1]
+    if convergence is not None:  # 格网方位角 + 收敛角 = 真方位角（顺时针旋转）
+        vertexConvergence = np.repeat(convergence, np.diff(offsets))
+        cosGamma, sinGamma = np.cos(vertexConvergence), np.sin(vertexConvergence)
+        x, y = x * cosGamma + y * sinGamma, y * cosGamma - x * sinGamma
+    proj4Length = projectionRange(x, y, offsets, directions)
+    if scale is not None:
+        proj4Length /= np.asarray(scale).reshape(-1, 1)
+    return proj4Length
@@ -0,0 +1,123 @@
+# coding=utf-8
+# 可选的编译加速内核（Numba）：导入时检测，已安装 numba 时使用多线程（nogil + prange）的编译实现，
+# 未安装或 useNumba 设为 False 时使用等价的 NumPy 实现，两者结果一致（浮点误差范围内）。
+# 内核：分段投影宽度（投影长度）、区间查找（网格归属）、高度分布计数、同类相邻边计数（聚集指数）
+
+import numpy as np
+
+try:  # 可选：numba 编译加速
+    from numba import njit, prange
+except ImportError:
+    njit = prange = None
+
+useNumba = njit is not None  # 可手动设为 False，全部使用 NumPy 实现
+projectionChunkSize = 1 << 24  # NumPy 投影宽度每块的投影矩阵元素数上限
+
+
+def projectionRangeNumPy(x, y, offsets, directions):
+    # 按建筑分块，每块的投影矩阵 (顶点数, k) 不超过 projectionChunkSize 个元素（方向很多时限制内存）
+    n, k = len(offsets) - 1, directions.shape[1]
+    result = np.empty((n, k))
+    starts = offsets[:-1]
+    chunkStarts = np.unique(np.searchsorted(offsets, np.arange(0, offsets[-1], max(projectionChunkSize // k, 1)),
+                                            side='right') - 1)
+    for first, last in zip(chunkStarts, np.append(chunkStarts[1:], n)):
+        start, stop = offsets[first], offsets[last]
+        projection = np.column_stack([x[start:stop], y[start:stop]]) @ directions  # (m, k) 每个顶点在各方向上的投影
+        local = starts[first:last] - start
+        result[first:last] = np.maximum.reduceat(projection, local, axis=0) - \
+            np.minimum.reduceat(projection, local, axis=0)
+    return result
+
+
+def searchBinsNumPy(values, edges):
+    return np.digitize(values, edges) - 1
+
+
+def binCount2dNumPy(row, col, rows, cols):
+    return np.bincount(row * cols + col, minlength=rows * cols).reshape(rows, cols)
+
+
+def shareEdgeCountNumPy(array, value):
+    same = array == value
+    return int(np.count_nonzero(same[:, :-1] & same[:, 1:]) + np.count_nonzero(same[:-1, :] & same[1:, :]))
+
+
+if njit is not None:
+    @njit(nogil=True, parallel=True, cache=True)
+    def projectionRangeNumba(x, y, offsets, directions):
+        n, k = len(offsets) - 1, directions.shape[1]
+        result = np.empty((n, k))
+        for i in prange(n):
+            for j in range(k):
+                u, v = directions[0, j], directions[1, j]
+                low = high = x[offsets[i]] * u + y[offsets[i]] * v
+                for m in range(offsets[i] + 1, offsets[i + 1]):
+                    p = x[m] * u + y[m] * v
+                    if p < low:
+                        low = p
+                    elif p > high:
+                        high = p
+                result[i, j] = high - low
+        return result
+
+    @njit(nogil=True, parallel=True, cache=True)
+    def searchBinsNumba(values, edges):
+        index = np.empty(len(values), dtype=np.int64)
+        for i in prange(len(values)):
+            index[i] = np.searchsorted(edges, values[i], side='right') - 1
+        return index
+
+    @njit(nogil=True, cache=True)
+    def binCount2dNumba(row, col, rows, cols):
+        counts = np.zeros((rows, cols), dtype=np.int64)
+        for i in range(len(row)):
+            counts[row[i], col[i]] += 1
+        return counts
+
+    @njit(nogil=True, parallel=True, cache=True)
+    def shareEdgeCountNumba(array, value):
+        rows, cols = array.shape
+        count = 0
+        for i in prange(rows):
+            for j in range(cols):
+                if array[i, j] == value:
+                    if j + 1 < cols and array[i, j + 1] == value:
+                        count += 1
+                    if i + 1 < rows and array[i + 1, j] == value:
+                        count += 1
+        return count
+
+
+def projectionRange(x, y, offsets, directions):
+    """
+    每个建筑的顶点在各方向上投影的最大值 - 最小值（即该方向上的投影宽度），返回 (N, k)。
+
+    参数:
+    x, y (np.ndarray): (M,) 全部建筑的平面坐标（扁平存放）。
+    offsets (np.ndarray): (N+1,) 每个建筑顶点的起止位置。
+    directions (np.ndarray): (2, k) 各方向的单位向量。
+    """
+    if useNumba:
+        return projectionRangeNumba(np.ascontiguousarray(x, dtype='float64'),
+                                    np.ascontiguousarray(y, dtype='float64'), np.asarray(offsets, dtype='int64'),
+                                    np.ascontiguousarray(directions, dtype='float64'))
+    return projectionRangeNumPy(x, y, offsets, directions)
+
+
+def searchBins(values, edges):  # 每个值所在区间的序号（与 np.digitize(values, edges) - 1 相同，NaN 为 len(edges) - 1）
+    if useNumba:
+        return searchBinsNumba(np.ascontiguousarray(values, dtype='float64'), np.asarray(edges, dtype='float64'))
+    return searchBinsNumPy(values, edges)
+
+
+def binCount2d(row, col, rows, cols):  # 二维计数 (rows, cols)：每对 (row, col) 加一
+    if useNumba:
+        return binCount2dNumba(np.asarray(row, dtype='int64'), np.asarray(col, dtype='int64'), rows, cols)
+    return binCount2dNumPy(row, col, rows, cols)
+
+
+def shareEdgeCount(array, value):  # 二维数组中值为 value 的相邻像元对数（右邻和下邻，即聚集指数的公共边数）
+    if useNumba:
+        return int(shareEdgeCountNumba(np.ascontiguousarray(array), array.dtype.type(value)))
+    return shareEdgeCountNumPy(array, value)
@@ -0,0 +1,193 @@
+# coding=utf-8
+# 可合并的部分统计量：每个文件（或分块）只保存有建筑的网格的可相加统计量，网格位置为全球经纬网格上的行列号，
+# 共享边界网格的多个文件按行列号相加即可得到精确的合并结果，最后再推导 mh、stdh、haw、λp 等比值类参数。
+#
+# 文件格式：<名称>.npy 为按 (row, col) 排序的结构化数组（每个网格一条记录，可按内存映射读取），
+#          <名称>.json 为元数据（分辨率、高度区间、多风向峰向指数的风向、统计量名称、范围、单个网格最大建筑数）。
+# 行号从南纬90°向北、列号从西经180°向东计数，与写出的GeoTIFF（左下角为原点）方向一致。
+
+import json
+import os
+import sys
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from computation.aggregate import allSumNames, bandCount, compactIndicators, deriveIndicators, dhDtype, \
+    indicatorDtype, indicatorSums, outputNames
+from computation.projection import gridCellArea
+from computation.sparse import sumByCell
+
+partialVersion = 1  # 部分统计量的格式版本
+mergeTileRows = 256  # 合并时每次读取的行数（行带），行带内再按列分块还原为稠密数组写出
+mergeTileCols = 2048
+
+
+def partialDtype(sums, nz, nd):
+    # 每个网格一条记录：行列号 + 各统计量（frontal 4 个方向，frontalN nd 个风向，dh 每个高度区间一个计数）
+    shapes = {'frontal': (4,), 'frontalN': (nd,), 'dh': (nz,)}
+    fields = [('row', 'int32'), ('col', 'int32')]
+    fields += [(name, 'uint32' if name == 'dh' else 'float64', shapes.get(name, ())) for name in sums]
+    return np.dtype(fields)
+
+
+def sparseFromDense(sums):  # 稠密网格统计量 -> 稀疏表（只保留有建筑的网格，含精确占地分摊时只有部分占地的网格）
+    occupied = sums['count'] > 0
+    if 'area' in sums:
+        occupied |= sums['area'] > 0
+    cells = np.flatnonzero(occupied.reshape(-1))
+    table = {'cells': cells}
+    for name, value in sums.items():
+        table[name] = value.reshape(value.shape[:-2] + (-1,))[..., cells]
+    return table
+
+
+def writePartial(path, table, nx, minLon, minLat, resolution, binZ, angles=()):
+    """
+    保存部分统计量（path 不含扩展名，写出 .npy 和 .json）。
+
+    参数:
+    table (dict): 稀疏表 {'cells': 文件网格内的扁平序号, 名称: (..., k)}，稠密结果先经 sparseFromDense 转换。
+    nx, minLon, minLat (int): 文件网格的列数和左下角经纬度（整度），用于换算为全球网格的行列号。
+    angles (list): 多风向峰向指数（frontalN）的风向（度）。
+    """
+    sums = [name for name in allSumNames if name in table]
+    iy, ix = np.divmod(table['cells'], nx)
+    records = np.zeros(len(iy), dtype=partialDtype(sums, len(binZ) - 1, len(angles)))
+    records['row'] = iy + (minLat + 90) * resolution
+    records['col'] = ix + (minLon + 180) * resolution
+    for name in sums:
+        records[name] = np.moveaxis(table[name], -1, 0)  # (..., k) -> (k, ...)
+    np.save(path + '.npy', records)
+    meta = {'version': partialVersion, 'resolution': resolution, 'binZ': [float(z) for z in binZ],
+            'frontalAngles': [float(angle) for angle in angles], 'sums': sums,
+            'cells': len(records), 'maxCount': int(table['count'].max()) if len(records) else 0,
+            'rows': [int(records['row'].min()), int(records['row'].max()) + 1] if len(records) else [0, 0],
+            'cols': [int(records['col'].min()), int(records['col'].max()) + 1] if len(records) else [0, 0]}
+    with open(path + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return path + '.npy'
+
+
+def readPartialMeta(path):  # path 为 .npy 或不含扩展名的路径
+    with open(os.path.splitext(path)[0] + '.json', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def readPartialRows(records, rowStart, rowStop):
+    """读取 [rowStart, rowStop) 行的记录（records 为内存映射，按行号二分查找，只读取这一段）"""
+    start, stop = np.searchsorted(records['row'], [rowStart, rowStop])
+    return np.asarray(records[start:stop])
+
+
+def mergeBand(bands, sums, rowStart, colStart, nx):  # 同一行带内各文件的记录按网格相加，返回稀疏表（行带内扁平序号）
+    row = np.concatenate([band['row'] for band in bands]).astype('int64')
+    col = np.concatenate([band['col'] for band in bands]).astype('int64')
+    cells, inverse = np.unique((row - rowStart) * nx + col - colStart, return_inverse=True)
+    table = {'cells': cells}
+    for name in sums:
+        values = np.concatenate([band[name] for band in bands]).astype('float64')
+        table[name] = sumByCell(np.moveaxis(values, 0, -1), inverse, len(cells))
+    return table
+
+
+def denseTile(table, nx, rows, colStart, colStop):  # 行带稀疏表中 [colStart, colStop) 列还原为稠密数组 (..., rows, cols)
+    col = table['cells'] % nx
+    inTile = (col >= colStart) & (col < colStop)
+    local = (table['cells'][inTile] // nx) * (colStop - colStart) + col[inTile] - colStart
+    tile = {}
+    for name, values in table.items():
+        if name == 'cells':
+            continue
+        dense = np.zeros(values.shape[:-1] + (rows * (colStop - colStart),))
+        dense[..., local] = values[..., inTile]
+        tile[name] = dense.reshape(values.shape[:-1] + (rows, colStop - colStart))
+    return tile
+
+
+def mergePartials(paths, outputFolder, name='merged', options=None, dhCumulative=False, compact=False,
+                  windWeights=None):
+    """
+    合并任意数量的部分统计量并写出参数GeoTIFF（每个参数一个文件，范围为全部输入的外包矩形）。
+
+    按行带流式读取（内存映射 + 二分查找，每个文件只读取与当前行带相交的记录），行带内按列分块推导参数并写出，
+    内存只与行带内有建筑的网格数和分块大小有关；统计量在 float64 下相加，合并结果与整体计算一致。
+
+    参数:
+    options (list): 输出的参数（键与界面选项一致），默认为全部输入都包含所需统计量的参数。
+    windWeights (list): λfRose 的各风向频率，默认为等权。
+    """
+    metas = [readPartialMeta(path) for path in paths]
+    resolution, binZ, angles = metas[0]['resolution'], metas[0]['binZ'], metas[0].get('frontalAngles', [])
+    for path, meta in zip(paths, metas):
+        if meta['version'] != partialVersion or meta['resolution'] != resolution or meta['binZ'] != binZ:
+            raise ValueError("{} 的格式版本、分辨率或高度区间与其他部分统计量不一致".format(path))
+        if 'frontalN' in meta['sums'] and meta.get('frontalAngles', []) != angles:
+            raise ValueError("{} 的多风向峰向指数风向与其他部分统计量不一致".format(path))
+    sums = [name for name in allSumNames if all(name in meta['sums'] for meta in metas)]
+    if options is None:
+        options = [option for option in indicatorSums if all(name in sums for name in indicatorSums[option])]
+    missing = {name for option in options for name in indicatorSums[option]} - set(sums)
+    if missing:
+        raise ValueError("部分统计量缺少 {}，无法推导所选参数".format(', '.join(sorted(missing))))
+
+    paths = [path for path, meta in zip(paths, metas) if meta['cells']]  # 没有建筑的部分统计量不参与合并
+    metas = [meta for meta in metas if meta['cells']]
+    if not metas:
+        raise ValueError("部分统计量中没有建筑")
+    # 输出范围：全部输入的外包矩形，扩展到整度（与单个文件的网格划分一致）
+    rowMin = min(meta['rows'][0] for meta in metas) // resolution * resolution
+    rowMax = -(-max(meta['rows'][1] for meta in metas) // resolution) * resolution
+    colMin = min(meta['cols'][0] for meta in metas) // resolution * resolution
+    colMax = -(-max(meta['cols'][1] for meta in metas) // resolution) * resolution
+    tifHeight, tifWidth = rowMax - rowMin, colMax - colMin
+    minLon, minLat = colMin // resolution - 180, rowMin // resolution - 90
+    maxLat = rowMax // resolution - 90
+    binY = np.linspace(minLat, maxLat, tifHeight + 1)
+    binX = np.linspace(minLon, colMax // resolution - 180, tifWidth + 1)
+    dhMaxCount = sum(meta['maxCount'] for meta in metas)  # 合并后单个网格建筑数的上界，各分块dh使用相同整型
+
+    os.makedirs(outputFolder, exist_ok=True)
+    prefix = os.path.join(outputFolder, '{}_{}_{}_'.format(name, minLon, maxLat))
+    outputPaths = {option: prefix + outputNames[option] + '.tif' for option in options}
+    dtypes = {option: dhDtype(dhMaxCount) if option == 'dh' else indicatorDtype(option, compact) for option in options}
+    # 与 calcuSingleData 相同：原点放左下角，纬度增量为负
+    transform = from_origin(minLon, minLat, 1 / resolution, -1 / resolution)
+    recordsList = [np.load(path, mmap_mode='r') for path in paths]
+    datasets = {option: rasterio.open(outputPaths[option], 'w', height=tifHeight, width=tifWidth,
+                                      count=bandCount(option, binZ, angles), dtype=dtypes[option],
+                                      crs='EPSG:4326', transform=transform)
+                for option in options}
+    try:
+        for rowStart in range(0, tifHeight, mergeTileRows):
+            rowStop = min(rowStart + mergeTileRows, tifHeight)
+            # 没有文件与行带相交时取一个空记录，得到空的稀疏表
+            bands = [readPartialRows(records, rowMin + rowStart, rowMin + rowStop)
+                     for records, meta in zip(recordsList, metas)
+                     if meta['rows'][0] < rowMin + rowStop and meta['rows'][1] > rowMin + rowStart] or \
+                [np.asarray(recordsList[0][:0])]
+            table = mergeBand(bands, sums, rowMin + rowStart, colMin, tifWidth)
+            gridTotalArea_AT = gridCellArea(binY[rowStart:rowStop + 1], binX)
+            for colStart in range(0, tifWidth, mergeTileCols):
+                colStop = min(colStart + mergeTileCols, tifWidth)
+                tile = denseTile(table, tifWidth, rowStop - rowStart, colStart, colStop)
+                with np.errstate(divide='ignore', invalid='ignore'):  # 没有建筑的网格比值为 NaN
+                    indicators = deriveIndicators(tile, gridTotalArea_AT[:, colStart:colStop], options, dhCumulative,
+                                                  dhMaxCount, windWeights)
+                if compact:
+                    indicators = compactIndicators(indicators)
+                for option, dst in datasets.items():
+                    value = indicators[option] if indicators[option].ndim == 3 else indicators[option][np.newaxis]
+                    dst.write(value, window=Window(colStart, rowStart, colStop - colStart, rowStop - rowStart))
+    finally:
+        for dst in datasets.values():
+            dst.close()
+    return [outputPaths[option] for option in options]
+
+
+if __name__ == '__main__':
+    # python -m computation.partial <输出文件夹> <部分统计量.npy> [<部分统计量.npy> ...]
+    from config import get_frontal_config
+    print('\n'.join(mergePartials(sys.argv[2:], sys.argv[1], windWeights=get_frontal_config()[1])))
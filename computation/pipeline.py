@@ -0,0 +1,476 @@
+# coding=utf-8
+# 建筑文件到UCP参数的计算流程（读取、投影、网格统计、推导参数、写出GeoTIFF）和全部计算设置，
+# 批量计算（computation.morphology）和单文件计算（computation.morphology_single）共用，界面相关的部分留在各自模块中。
+
+import os
+import sys
+
+# os.environ['PROJ_LIB'] = r"G:\qgis\apps\Python312\lib\site-packages\rasterio\proj_data\proj.db"
+from datetime import datetime as d
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from config import get_dh_config, get_frontal_config
+from computation.aggregate import aggregateCells, aggregateGrid, bandCount, bandNames, coarsenAggregates, \
+    compactIndicators, deriveIndicators, dhDtype, gridBins, indicatorDtype, mergeAggregates, metricBins, \
+    metricCellIndex, outputNames, planIndicators, pyramidFactors
+from computation.sparse import aggregateSparse, coarsenSparse, denseWindow, iterWindows, mergeSparse
+from computation.partial import sparseFromDense, writePartial
+from computation.cog import closeTargets, convertToCog, openStack, writeTargets
+from computation.cache import cacheKey, cachedFields, loadCache, saveCache
+from computation.apportion import footprintPieces
+from computation.buildings import Buildings, buildPolygons, polygonMetrics
+from computation.frontal import calcu4ProjLengthRagged, calcuProjLengthByAngles
+from computation.zonal import assignZones, checkZonalPath, readZones, writeZonalTable, zoneAreas, zoneTree
+from computation.reader import featureRanges, readBuildingRings, readFeatureInfo
+from computation.quality import areaFilter, logRejected, mergeRejected, newRejected, rejectedFromArray, \
+    rejectedToArray, writeQualitySummary
+from computation.projection import create_utm_transformers, extentCenter, gridCellArea, localEqualAreaTransformers, \
+    localGridCorrection, metricGridCrs, metricTransformer, projectPoints, projectRingsByZone, transformByZone, \
+    utmGridCorrection
+
+# 忽略haw计算出现的area=0作分母
+np.seterr(divide='ignore', invalid='ignore')
+building_min_height=1
+building_min_area=5
+building_max_area=400000  # 面积不小于该值的记录视为误差
+numberOfEachDegree = 120  # 结果的空间分辨率 -> (1/num)° , 这里的120即最终空间分辨率为1°/120，为0.5‘
+# 输出的分辨率（每度网格数），如 (120, 60, 24, 12)：各级由 numberOfEachDegree 网格的统计量按块相加后推导，只读取一次数据
+outputResolutions = (numberOfEachDegree,)
+# 高度字段
+heightField = 'Height'  # 按照shp数据格式更改字段名称
+# 读取方式：'auto' / 'bulk'（pyogrio列式批量读取） / 'stream'（fiona逐要素读取）
+readerBackend = 'auto'
+# 投影方式：'utm' 每个建筑按所在UTM分带投影；'local' 每个文件用以其范围中心为原点的一个等积投影（LAEA），一次调用完成
+projectionMode = 'utm'
+# 建筑派生属性缓存（面积、高度、中心点、周长、投影长度），重复计算同一文件时跳过读取和投影
+useCache = True
+cacheFolder = './cache'
+cacheMaxBytes = 20 * 1024 ** 3  # 缓存总大小上限，超过后按最近使用淘汰
+cacheContentHash = False  # 是否在指纹中加入文件内容哈希（更可靠但需要完整读一遍文件）
+# 紧凑精度：派生属性和参数结果使用 float32，数量和高度分布使用整型（网格统计量仍以 float64 累加），内存约减半
+compactPrecision = False
+# 输出网格数超过该值（约 12°×12°）时只统计有建筑的网格（稀疏表），写出时逐窗口还原，内存随有建筑的网格数增长
+denseMaxCells = 1440 * 1440
+# 高度分布（dh）的高度区间划分，以及是否输出累积分布（config.json 中 computation 的 dh_bins / dh_cumulative）
+# 多风向峰向指数（λfN 每个风向一个波段、λfRose 风玫瑰加权）的风向（度，风的来向）和各风向频率（None 为等权）
+# （config.json 中 computation 的 frontal_directions / wind_rose_weights）
+# 为 None 时在计算开始时由 loadComputationConfig 读取并检查，配置错误不影响程序启动
+dhBins, dhCumulative = None, False
+frontalAngles, windRoseWeights = None, None
+# 建筑归属网格的方式：'centroid' 整个建筑计入中心点所在网格；'exact' 跨网格建筑的面积、体积、墙面面积和迎风面积
+# 按各网格内的占地比例分摊（数量和高度统计仍按中心点）
+footprintMode = 'centroid'
+# 同时保存可合并的部分统计量（只含有建筑的网格，位置为全球网格行列号），多个文件的结果可用 computation.partial 精确拼接
+savePartial = False
+# 网格方式：'degree' 每度 numberOfEachDegree 个的经纬网格；'metric' 坐标系 metricCrs 下边长 metricCellSize 米的投影网格，
+# 网格面积为常数，建筑按投影后的中心点归属网格（只输出这一个分辨率，不支持精确占地分摊和部分统计量）
+gridMode = 'degree'
+metricCellSize = 250  # 投影网格边长（米），如 100 / 250 / 500
+# 投影网格的坐标系（如 'EPSG:6933'、'EPSG:3857' 或 proj 字符串），多个文件的结果需要拼接时应使用同一个坐标系；
+# None 时每个文件使用以其范围中心为原点的等积投影（LAEA）
+metricCrs = None
+# 输出方式：'separate' 每个参数一个GeoTIFF（按参数分文件夹）；'cog' 每个城市（每个分辨率）一个多波段
+# Cloud-Optimized GeoTIFF（cog 文件夹，分块压缩，波段名为参数名，全部波段的数据类型为 outputDtype）
+outputLayout = 'separate'
+outputCompress = 'ZSTD'  # COG 的压缩方式：'ZSTD' / 'DEFLATE'（均使用预测器）
+outputDtype = 'float32'  # COG 的数据类型：'float32' / 'float64'
+
+
+def loadComputationConfig():
+    """
+    读取并检查 config.json 中的高度区间划分、风向和风玫瑰权重，配置错误时抛出 ValueError。
+    已读取（或已直接设置）的不再读取；各计算入口（包括进程池中的分片）开始时调用。
+    """
+    global dhBins, dhCumulative, frontalAngles, windRoseWeights
+    if dhBins is None:
+        dhBins, dhCumulative = get_dh_config()
+    if frontalAngles is None:
+        frontalAngles, windRoseWeights = get_frontal_config()
+
+
+def buildingsCacheKey(shpFileDir):  # 缓存键包含影响派生属性的全部参数
+    settings = {'heightField': heightField, 'building_min_height': building_min_height,
+                'building_min_area': building_min_area, 'projectionMode': projectionMode,
+                'compactPrecision': compactPrecision, 'frontalAngles': [float(angle) for angle in frontalAngles]}
+    if footprintMode == 'exact':  # 占地分摊与网格分辨率有关
+        settings['footprintResolution'] = numberOfEachDegree
+    return cacheKey(shpFileDir, settings, cacheContentHash)
+
+
+def defaultAttributes():  # 未指定时计算全部建筑属性，各部分的占地比例只在精确占地分摊（经纬网格）时计算
+    exact = footprintMode == 'exact' and gridMode == 'degree'
+    return tuple(name for name in Buildings.attributes if exact or name not in Buildings.pieceAttributes)
+
+
+def loadGeoAndHeightData(shpFileDir, attributes=None, progress=None):
+    attributes = attributes or defaultAttributes()
+    if not useCache:
+        return ingestGeoAndHeightData(shpFileDir, attributes=attributes, progress=progress)
+    key = buildingsCacheKey(shpFileDir)
+    cached = loadCache(cacheFolder, key)
+    if cached is not None and all(name in cached for name in attributes):
+        print("读取 {} 缓存，当前时间 {}".format(shpFileDir.split("\\")[-1].split(".")[0], d.now().strftime('%m-%d %H:%M:%S')))
+        buildings = Buildings.fromArrays(cached)
+        buildings.rejected = rejectedFromArray(cached['rejected'])
+        return buildings
+    if cached is not None:  # 缓存缺少本次需要的属性：连同缓存中已有的属性一起重新计算
+        attributes = [name for name in Buildings.attributes if name in attributes or name in cached]
+    buildings = ingestGeoAndHeightData(shpFileDir, attributes=attributes, progress=progress)
+    saveCache(cacheFolder, key, dict(buildings.toArrays(), rejected=rejectedToArray(buildings.rejected)),
+              cacheMaxBytes)
+    return buildings
+
+
+def ingestGeoAndHeightData(shpFileDir, featureRange=None, attributes=None, progress=None):
+    attributes = attributes or defaultAttributes()
+    transformers, transformersRev = create_utm_transformers()
+    print(
+        "开始加载 {} ，当前时间 {}".format(shpFileDir.split("\\")[-1].split(".")[0], d.now().strftime('%m-%d %H:%M:%S')))
+    # 只读取外环和高度（高度筛选在解码几何之前完成），顶点统一放入扁平数组；各阶段按原因统计剔除数量
+    rejected = newRejected()
+    buildings = readBuildingRings(shpFileDir, heightField, building_min_height, readerBackend, progress,
+                                  featureRange, rejected)
+
+    if projectionMode == 'local':
+        # 整个文件（含全部分片）使用同一个以文件范围中心为原点的等积投影，一次调用完成
+        lon0, lat0 = extentCenter(readFeatureInfo(shpFileDir)[1])
+        forward, inverse = localEqualAreaTransformers(lon0, lat0)
+        projCoords = np.column_stack(forward.transform(buildings.coords[:, 0], buildings.coords[:, 1]))
+        buildingKeys = np.zeros(len(buildings), dtype='int64')
+    else:
+        # 批量投影（每个分带一次调用）
+        projCoords, buildingKeys = projectRingsByZone(buildings.coords, buildings.offsets, transformers)
+
+    # 一次构建全部几何，向量化计算面积、周长和中心点
+    area, perimeter, centroid = polygonMetrics(buildPolygons(projCoords, buildings.offsets))
+    firstPoint = buildings.coords[buildings.offsets[:-1]]
+    if projectionMode != 'local':
+        # UTM面积和周长含点比例因子k（分带边缘约 1e-3），改正为椭球面上的真实值，与椭球面网格面积一致
+        convergence, scale = utmGridCorrection(firstPoint[:, 0], firstPoint[:, 1], buildingKeys)
+        area, perimeter = area / scale ** 2, perimeter / scale
+    keep = areaFilter(area, building_min_area, building_max_area, rejected)  # 清除误差记录
+    projCoords = projCoords[np.repeat(keep, buildings.vertexCounts())]
+    buildings.area, buildings.perimeter = area, perimeter
+    buildings = buildings.select(keep)
+    buildingKeys, centroid, firstPoint = buildingKeys[keep], centroid[keep], firstPoint[keep]
+
+    # proj4theta 在投影坐标上一次算完全部建筑（收敛角和比例因子改正到真北和真实长度），不需要λf时跳过
+    if 'proj4Length' in attributes or 'projLength' in attributes:
+        if projectionMode == 'local':
+            convergence, scale = localGridCorrection(firstPoint[:, 0], firstPoint[:, 1], lon0, lat0)
+        else:
+            convergence, scale = convergence[keep], scale[keep]
+        if 'proj4Length' in attributes:
+            buildings.proj4Length = calcu4ProjLengthRagged(projCoords, buildings.offsets, convergence, scale)
+        # 多风向：全部风向的投影长度由一次矩阵乘积得到（相反风向只算一次）
+        if 'projLength' in attributes:
+            buildings.projLength = calcuProjLengthByAngles(projCoords, buildings.offsets, frontalAngles, convergence,
+                                                           scale)
+
+    # 精确占地分摊：跨网格建筑在各网格内的占地比例（在筛选后的经纬度外环上计算）
+    if 'pieceCount' in attributes:
+        buildings.pieceCount, buildings.pieceCenter, buildings.pieceFraction = \
+            footprintPieces(buildings.coords, buildings.offsets, numberOfEachDegree)
+
+    # CenterLocation (Geo)，按分带批量反投影
+    if projectionMode == 'local':
+        centerLon, centerLat = inverse.transform(centroid[:, 0], centroid[:, 1])
+    else:
+        centerLon, centerLat = transformByZone(centroid[:, 0], centroid[:, 1], buildingKeys, transformersRev)
+    buildings.centroid = np.column_stack([centerLon, centerLat])
+    buildings.rejected = rejected
+    if compactPrecision:
+        buildings.astype('float32')
+    print(
+        "加载 {} 完成，当前时间 {}".format(shpFileDir.split("\\")[-1].split(".")[0], d.now().strftime('%m-%d %H:%M:%S')))
+
+    return buildings
+
+
+def getGridTotalArea(latList, lonList):
+    if gridMode == 'metric':  # 投影网格：每个网格的面积都是边长的平方
+        return float(metricCellSize) ** 2
+    # 每个纬度带的椭球面网格面积解析计算一次并广播到各列（按纬度范围和分辨率缓存），不再逐网格投影
+    return gridCellArea(latList, lonList)
+
+
+def metricGrid(bounds):
+    """
+    投影网格的坐标系和网格边界 (crs, binY, binX)，由文件的经纬度范围确定（不读取要素），
+    分片和不分片计算得到同一网格，结果与分片数量、进程池大小无关。
+    经纬度外包矩形投影后的边界为曲线，四周各留一个网格。
+    """
+    crs = metricGridCrs(metricCrs, bounds)
+    minX, minY, maxX, maxY = metricTransformer(crs).transform_bounds(*bounds)
+    binY, binX = metricBins((minX - metricCellSize, minY - metricCellSize, maxX + metricCellSize,
+                             maxY + metricCellSize), metricCellSize)
+    return crs, binY, binX
+
+
+def degreeGrid(bounds):
+    """
+    经纬网格的网格边界和整度范围 (binY, binX, (minLon, minLat, maxLon, maxLat))，由文件的经纬度范围确定（不读取要素），
+    全部中心点和精确占地分摊的各部分都在范围内。
+    """
+    minLon, minLat = (int(value) for value in np.floor(bounds[:2]))
+    maxLon, maxLat = (int(value) for value in np.ceil(bounds[2:]))
+    # nx, ny =120 都是1°分为120个Grid，numberOfEachDegree 默认是120
+    # 注意！！！由于binned_statistic函数要求区间单增，所以经度是反着来的（越往两级纬度越低，后面改代码要当心！！！！！）
+    binY, binX = gridBins(minLon, maxLon, minLat, maxLat, numberOfEachDegree)
+    return binY, binX, (minLon, minLat, maxLon, maxLat)
+
+
+def calcuShard(data):  # 进程池中读取并统计一个要素区间，返回该分片的网格统计量（和需要缓存的派生属性）
+    shpFileDir, featureRange, binY, binX, binZ, sumList, attributes, sparse, crs = data
+    loadComputationConfig()
+    buildings = ingestGeoAndHeightData(shpFileDir, featureRange, attributes)
+    aggregate = aggregateSparse if sparse else aggregateGrid
+    # 投影网格（crs 不为 None）：中心点投影后按网格边长直接换算网格序号
+    cell = None if crs is None else metricCellIndex(projectPoints(buildings.centroid, crs), binY, binX)
+    return aggregate(buildings, binY, binX, binZ, sumList, cell), buildings.toArrays() if useCache else None, buildings.rejected
+
+
+def calcuCitySums(shpFileDir, cityName, folderDict, threeDptions, pool=None, poolSize=1, progress=None):
+    """
+    读取一个建筑文件并统计到网格，写出数据质量汇总（和部分统计量），返回 (网格统计量, 网格)。
+    网格为 dict：binY、binX、binZ、crs、sparse、needGridArea，经纬网格另有 extent（整度范围 minLon, minLat, maxLon, maxLat）。
+
+    参数:
+    pool: 给定进程池时，大文件按要素区间分片并行读取并统计（缓存已包含所需属性时直接读缓存，不分片）。
+    progress: 界面进度条（读取阶段更新），批量计算时为 None。
+    """
+    loadComputationConfig()
+    binZ = dhBins  # 计算dh的高度区间划分
+    # 按所选参数确定需要的网格统计量、建筑属性和是否需要网格面积，未用到的计算全部跳过
+    sumList, attributes, needGridArea = planIndicators(threeDptions, footprintMode == 'exact' and gridMode == 'degree')
+
+    # 网格由文件范围确定（不读取要素），分片和不分片计算得到同一网格，结果的范围、文件名与分片数量、进程池大小无关
+    featureCount, bounds = readFeatureInfo(shpFileDir)
+    if gridMode == 'metric':
+        crs, binY, binX = metricGrid(bounds)
+        extent = None
+    else:
+        crs = 'EPSG:4326'
+        binY, binX, extent = degreeGrid(bounds)
+        minLon, minLat, maxLon, maxLat = extent
+    # 统计每个网格的数量、高度和、平方和、面积、体积、墙面面积、迎风面积和高度分布（范围很大时只统计有建筑的网格）
+    sparse = (len(binY) - 1) * (len(binX) - 1) > denseMaxCells
+
+    shardRanges = [None]
+    fields = cachedFields(cacheFolder, buildingsCacheKey(shpFileDir)) if useCache else set()
+    if pool is not None and not fields.issuperset(attributes):
+        # 重新计算时保留缓存中已有的属性，避免写回缓存时丢失
+        attributes = tuple(name for name in Buildings.attributes if name in attributes or name in fields)
+        shardRanges = featureRanges(featureCount, poolSize)
+
+    if len(shardRanges) > 1:
+        # 各分片统计到同一网格上，统计量相加即为整个文件的结果
+        print("{} 分为 {} 片并行计算，当前时间 {}".format(cityName, len(shardRanges), d.now().strftime('%m-%d %H:%M:%S')))
+        shardTasks = [[shpFileDir, shardRange, binY, binX, binZ, sumList, attributes, sparse,
+                       crs if gridMode == 'metric' else None]
+                      for shardRange in shardRanges]
+        results = pool.map(calcuShard, shardTasks)
+        sums = (mergeSparse if sparse else mergeAggregates)([item[0] for item in results])
+        rejected = mergeRejected([item[2] for item in results])
+        if useCache:
+            arrays = {name: np.concatenate([item[1][name] for item in results]) for name in results[0][1]}
+            saveCache(cacheFolder, buildingsCacheKey(shpFileDir), dict(arrays, rejected=rejectedToArray(rejected)),
+                      cacheMaxBytes)
+    else:
+        # 周长面积等基本信息和四个角度的投影长度
+        buildings = loadGeoAndHeightData(shpFileDir, attributes, progress)
+        # 投影网格：中心点投影到网格坐标系后换算网格序号；经纬网格按中心点（和占地分摊的各部分）查找所在网格
+        cell = None if gridMode != 'metric' else metricCellIndex(projectPoints(buildings.centroid, crs), binY, binX)
+        sums = (aggregateSparse if sparse else aggregateGrid)(buildings, binY, binX, binZ, sumList, cell)
+        rejected = buildings.rejected
+
+    print("计算 {} 完成，当前时间 {}".format(cityName, d.now().strftime('%m-%d %H:%M:%S')))
+    # 数据质量：各原因剔除的建筑数量写入日志和JSON汇总
+    kept = int(sums['count'].sum())
+    logRejected(cityName, kept, rejected)
+    writeQualitySummary(folderDict['quality'] + '\\' + cityName + '_quality.json', cityName, kept, rejected)
+    if savePartial and gridMode == 'degree':
+        # 可合并的部分统计量：相邻文件共享的边界网格在拼接时按统计量相加，再推导比值类参数
+        writePartial(folderDict['partial'] + '\\' + cityName + '_partial', sums if sparse else sparseFromDense(sums),
+                     len(binX) - 1, minLon, minLat, numberOfEachDegree, binZ, frontalAngles)
+    grid = {'binY': binY, 'binX': binX, 'binZ': binZ, 'crs': crs, 'sparse': sparse, 'needGridArea': needGridArea,
+            'extent': extent}
+    return sums, grid
+
+
+def writeCityTifs(sums, grid, cityName, folderDict, threeDptions):
+    """由网格统计量推导所选参数并写出GeoTIFF（经纬网格按 outputResolutions 每个分辨率一组），返回写出的路径"""
+    binY, binX, binZ, crs = grid['binY'], grid['binX'], grid['binZ'], grid['crs']
+    if gridMode == 'metric':
+        # 投影网格只输出一个分辨率，原点同样放左下角，纵向增量为负
+        corner = '_' + str(metricCellSize) + 'm_'
+        levels = [(1, binY, binX, from_origin(binX[0], binY[0], metricCellSize, -metricCellSize), '')]
+    else:
+        minLon, minLat, maxLon, maxLat = grid['extent']
+        corner = '_' + str(minLon) + '_' + str(maxLat) + '_'
+        levels = []
+        for resolution, factor in pyramidFactors(numberOfEachDegree, outputResolutions):
+            # 粗分辨率的统计量由最细网格按块相加得到（文件名加 _分辨率 后缀），再推导各级的比值类参数
+            levelBinY, levelBinX = gridBins(minLon, maxLon, minLat, maxLat, resolution)
+            # binStatic的纬度增下来的，所以这里的点放左下角，纬度增量为负反着向上写（和rasterio的左上区别开）
+            transform = from_origin(minLon, minLat, 1 / resolution, -1 / resolution)
+            suffix = '' if resolution == numberOfEachDegree else '_' + str(resolution)
+            levels.append((factor, levelBinY, levelBinX, transform, suffix))
+    # write GeoTiff
+    path = []
+    for factor, levelBinY, levelBinX, transform, suffix in levels:
+        if grid['sparse']:
+            # 稀疏统计：逐窗口还原为稠密数组后推导参数并写出
+            path += writeSparseTifs(coarsenSparse(sums, len(binX) - 1, factor), levelBinY, levelBinX, binZ,
+                                    threeDptions, folderDict, cityName + corner, suffix, transform,
+                                    grid['needGridArea'], crs)
+        else:
+            # 计算划分好网格的面积（AT） （这里也是反着的纬度）
+            gridTotalArea_AT = getGridTotalArea(levelBinY, levelBinX) if grid['needGridArea'] else None
+            # 由统计量推导UCP参数（count、sum、area、volume 同时保存，用于拼接后计算全球参数）
+            indicators = deriveIndicators(coarsenAggregates(sums, factor), gridTotalArea_AT, threeDptions, dhCumulative,
+                                          windWeights=windRoseWeights)
+            if compactPrecision:
+                indicators = compactIndicators(indicators)
+            path += writeDenseTifs(indicators, threeDptions, folderDict, cityName + corner, suffix, transform,
+                                   crs)
+    return path
+
+
+def convertOutputs(path, threeDptions):  # outputLayout 为 'cog' 时把写出的多波段GeoTIFF转换为COG（分块、压缩，写入波段名）
+    if outputLayout != 'cog':
+        return path
+    names = [name for option in threeDptions for name in bandNames(option, dhBins, frontalAngles)]
+    for i in path:
+        convertToCog(i, names, outputCompress)
+    return path
+
+
+def openOutputs(counts, dtypes, folderDict, prefix, suffix, height, width, transform, crs):
+    """
+    按 outputLayout 打开输出，返回 (路径列表, {参数: (数据集, 波段序号)})：每个参数一个GeoTIFF，
+    或全部参数一个多波段GeoTIFF（写完后转换为COG）。counts、dtypes 为各参数的波段数和数据类型。
+    """
+    if outputLayout == 'cog':
+        path = folderDict['cog'] + '\\' + prefix + 'UCP' + suffix + '.tif'
+        return [path], openStack(path, counts, height, width, outputDtype, crs, transform)
+    paths = {option: folderDict[option] + '\\' + prefix + outputNames[option] + suffix + '.tif' for option in counts}
+    targets = {option: (rasterio.open(paths[option], 'w', height=height, width=width, count=counts[option],
+                                      dtype=dtypes[option], crs=crs, transform=transform), None)
+               for option in counts}
+    return list(paths.values()), targets
+
+
+def writeDenseTifs(indicators, threeDptions, folderDict, prefix, suffix, transform, crs='EPSG:4326'):
+    """稠密结果写出：每个参数一个GeoTIFF（dh、λfN 每个高度区间/风向一个波段）或一个多波段GeoTIFF，返回写出的路径"""
+    counts = {option: len(indicators[option]) if indicators[option].ndim == 3 else 1 for option in threeDptions}
+    dtypes = {option: indicators[option].dtype.name for option in threeDptions}
+    height, width = indicators[threeDptions[0]].shape[-2:]
+    paths, targets = openOutputs(counts, dtypes, folderDict, prefix, suffix, height, width, transform, crs)
+    try:
+        writeTargets(targets, indicators)
+    finally:
+        closeTargets(targets)
+    return paths
+
+
+def writeSparseTifs(table, binY, binX, binZ, threeDptions, folderDict, prefix, suffix, transform, needGridArea,
+                    crs='EPSG:4326'):
+    """稀疏统计结果逐窗口写出：每个窗口还原为稠密数组、计算网格面积并推导参数，内存只与窗口大小有关"""
+    tifHeight, tifWidth = len(binY) - 1, len(binX) - 1
+    dhMaxCount = table['dh'].sum(axis=0).max() if 'dh' in table and len(table['cells']) else 0  # 各窗口dh使用相同整型
+    counts = {option: bandCount(option, binZ, frontalAngles) for option in threeDptions}
+    dtypes = {option: dhDtype(dhMaxCount) if option == 'dh' else indicatorDtype(option, compactPrecision)
+              for option in threeDptions}
+    paths, targets = openOutputs(counts, dtypes, folderDict, prefix, suffix, tifHeight, tifWidth, transform, crs)
+    try:
+        for rowStart, rowStop in iterWindows(tifHeight):
+            window = denseWindow(table, tifWidth, rowStart, rowStop)
+            gridTotalArea_AT = getGridTotalArea(binY[rowStart:rowStop + 1], binX) if needGridArea else None
+            indicators = deriveIndicators(window, gridTotalArea_AT, threeDptions, dhCumulative, dhMaxCount,
+                                          windRoseWeights)
+            if compactPrecision:
+                indicators = compactIndicators(indicators)
+            writeTargets(targets, indicators, Window(0, rowStart, tifWidth, rowStop - rowStart))
+    finally:
+        closeTargets(targets)
+    return paths
+
+
+def createFolder(dataPath,paraSaveFolder,threeDptions):
+    folderDict = {}
+    folderDict['data'] = dataPath
+    if outputLayout == 'cog':
+        folderDict['cog'] = os.path.join(paraSaveFolder, 'cog')  # 每个城市一个多波段COG
+    else:
+        for para in threeDptions:
+            folderDict[para] = os.path.join(paraSaveFolder, para)
+    folderDict['quality'] = os.path.join(paraSaveFolder, 'quality')  # 数据质量汇总
+    if savePartial:
+        folderDict['partial'] = os.path.join(paraSaveFolder, 'partial')  # 可合并的部分统计量
+
+    # 提前新建文件夹
+    [os.makedirs(folder) for folder in folderDict.values() if not os.path.exists(folder)]
+    return folderDict
+
+
+def calcuZonalShard(data):  # 读取一个建筑文件（或其要素区间）并按分区统计，返回统计量、剔除计数和不在任何分区内的建筑数
+    shpFileDir, featureRange, zoneFileDir, binZ, sumList, attributes = data
+    loadComputationConfig()
+    buildings = loadGeoAndHeightData(shpFileDir, attributes) if featureRange is None else \
+        ingestGeoAndHeightData(shpFileDir, featureRange, attributes)
+    zone = assignZones(buildings.centroid, zoneTree(zoneFileDir))
+    sums = aggregateCells(buildings, zone, len(readZones(zoneFileDir)), binZ, sumList)
+    return sums, buildings.rejected, int((zone < 0).sum())
+
+
+def calcuZonalData(shpFileDirs, zoneFileDir, outputPath, threeDptions, pool=None, poolSize=1):
+    """
+    分区统计：全部建筑文件的中心点归属到分区图层的多边形，统计量按分区相加后推导UCP参数，写出为矢量表。
+
+    参数:
+    zoneFileDir (str): 分区图层（街区、行政区等多边形，任意坐标系）。
+    outputPath (str): 结果路径，.gpkg 带分区几何，.csv 只写属性（不支持 .shp，见 checkZonalPath）。
+    pool: 给定进程池时按文件并行，没有可用缓存的大文件再按要素区间分片（分片读取的文件不写缓存）。
+    """
+    checkZonalPath(outputPath)
+    loadComputationConfig()
+    print('开始分区统计 共{}文件 当前时间 {}'.format(len(shpFileDirs), d.now().strftime('%m-%d %H:%M:%S')))
+    sumList, attributes, needZoneArea = planIndicators(threeDptions)
+    zones = readZones(zoneFileDir)
+    tasks = []
+    for shpFileDir in shpFileDirs:
+        shardRanges = [None]
+        fields = cachedFields(cacheFolder, buildingsCacheKey(shpFileDir)) if useCache else set()
+        if pool is not None and not fields.issuperset(attributes):
+            shardRanges = featureRanges(readFeatureInfo(shpFileDir)[0], poolSize)
+        tasks += [[shpFileDir, shardRange if len(shardRanges) > 1 else None, zoneFileDir, dhBins, sumList, attributes]
+                  for shardRange in shardRanges]
+    results = pool.map(calcuZonalShard, tasks) if pool is not None else [calcuZonalShard(task) for task in tasks]
+
+    # 各文件的统计量按分区相加；保留的建筑包括不在任何分区内的建筑（通过筛选但未计入统计），两者分开记录
+    sums = mergeAggregates([item[0] for item in results])
+    assigned = int(sums['count'].sum())
+    outside = sum(item[2] for item in results)
+    logRejected('分区统计', assigned + outside, mergeRejected([item[1] for item in results]))
+    print("{} 个分区，{} 个建筑计入分区，{} 个建筑不在任何分区内".format(len(zones), assigned, outside))
+    zoneArea = zoneAreas(zones.geometry) if needZoneArea else None
+    indicators = deriveIndicators(sums, zoneArea, threeDptions, dhCumulative, windWeights=windRoseWeights)
+    writeZonalTable(outputPath, zones, indicators, threeDptions, dhBins, frontalAngles)
+    print("分区统计写入 {} 完成，当前时间 {}".format(outputPath, d.now().strftime('%m-%d %H:%M:%S')))
+    return outputPath
+
+
+if __name__ == '__main__':
+    # python -m computation.pipeline <分区图层> <结果 .gpkg/.csv> <参数,参数,...> <建筑.shp> [<建筑.shp> ...]
+    # 参数为 outputNames 的键（如 count,mh,lp,lfN,dh），计算设置使用本模块的设置和 config.json
+    import multiprocessing
+    options = sys.argv[3].split(',')
+    unknown = [option for option in options if option not in outputNames]
+    if unknown:
+        sys.exit('未知参数 {}，可选 {}'.format(','.join(unknown), ','.join(outputNames)))
+    with multiprocessing.Pool() as pool:
+        print(calcuZonalData(sys.argv[4:], sys.argv[1], sys.argv[2], options, pool, multiprocessing.cpu_count()))
@@ -0,0 +1,172 @@
+# coding=utf-8
+
+from functools import lru_cache
+
+import numpy as np
+from pyproj import Proj, Transformer
+
+
+def utmProjString(zone, hemisphere):
+    return f'+proj=utm +zone={zone} {"+south" if hemisphere == "south" else ""} +ellps=WGS84 +datum=WGS84 +units=m +no_defs'
+
+
+class UtmTransformerRegistry(dict):
+    """
+    UTM转换器登记表：某个分带第一次被用到时才创建 (zone, hemisphere) 的转换器，之后在整个进程内复用。
+
+    进程池中每个子进程各自持有一份，同一子进程处理多个文件时不再重复创建。
+    """
+
+    def __init__(self, inverse=False):
+        super().__init__()
+        self.inverse = inverse
+
+    def __missing__(self, key):
+        zone, hemisphere = key
+        geo, utm = Proj(proj='latlong', datum='WGS84'), Proj(utmProjString(zone, hemisphere))
+        # Geo to Proj / Proj to Geo
+        transformer = Transformer.from_proj(utm, geo, always_xy=True) if self.inverse else \
+            Transformer.from_proj(geo, utm, always_xy=True)
+        self[key] = transformer
+        return transformer
+
+
+utmTransformers = UtmTransformerRegistry()
+utmTransformersRev = UtmTransformerRegistry(inverse=True)
+
+
+def create_utm_transformers():  # 返回进程内共享的正/反向转换器登记表（按需创建，不再一次构建120个分带）
+    return utmTransformers, utmTransformersRev
+
+
+def utmZoneKey(lon, lat):  # 按经纬度计算UTM分带，返回 zone*2+south 的整型编码，便于分组
+    lon = np.asarray(lon, dtype='float64')
+    lat = np.asarray(lat, dtype='float64')
+    zone = ((lon + 180) / 6).astype('int64') + 1
+    return zone * 2 + (lat < 0)
+
+
+def zoneKeyToTuple(key):  # 编码 -> (zone, hemisphere)，与 create_utm_transformers 的键一致
+    return int(key) // 2, 'south' if int(key) % 2 else 'north'
+
+
+def transformByZone(x, y, keys, transformers):
+    """
+    按UTM分带分组批量投影：每个分带只调用一次 transformer.transform(array, array)。
+
+    参数:
+    x, y (np.ndarray): 待转换的坐标（一维）。
+    keys (np.ndarray): 每个坐标点所属分带的编码（见 utmZoneKey）。
+    transformers (dict): (zone, hemisphere) -> pyproj.Transformer。
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    outX, outY = np.empty_like(x), np.empty_like(y)
+    for key in np.unique(keys):
+        mask = keys == key
+        outX[mask], outY[mask] = transformers[zoneKeyToTuple(key)].transform(x[mask], y[mask])
+    return outX, outY
+
+
+def projectRingsByZone(geoCoords, offsets, transformers):
+    """
+    将全部建筑的顶点（扁平存放）按建筑所在UTM分带批量投影。
+
+    建筑的分带由其第一个顶点决定（与逐点投影时的规则相同），同一建筑的全部顶点使用同一分带。
+
+    参数:
+    geoCoords (np.ndarray): (M, 2) 全部建筑顶点经纬度。
+    offsets (np.ndarray): (N+1,) 每个建筑顶点在 geoCoords 中的起止位置。
+    transformers (dict): 正向（经纬度->UTM）转换器。
+
+    返回:
+    projCoords (np.ndarray): (M, 2) 投影坐标。
+    buildingKeys (np.ndarray): (N,) 每个建筑的分带编码，用于之后反投影中心点。
+    """
+    firstPoint = geoCoords[offsets[:-1]]
+    buildingKeys = utmZoneKey(firstPoint[:, 0], firstPoint[:, 1])
+    vertexKeys = np.repeat(buildingKeys, np.diff(offsets))
+    projX, projY = transformByZone(geoCoords[:, 0], geoCoords[:, 1], vertexKeys, transformers)
+    return np.column_stack([projX, projY]), buildingKeys
+
+
+def utmGridCorrection(lon, lat, keys, k0=0.9996):
+    """
+    UTM格网相对真北的子午线收敛角（弧度）和点比例因子（球面近似）。
+
+    真方位角 = 格网方位角 + 收敛角；真实距离 = 格网距离 / 比例因子。
+    """
+    lon0 = (np.asarray(keys) // 2 - 1) * 6 - 180 + 3  # 分带中央经线
+    deltaLon = np.radians(np.asarray(lon) - lon0)
+    phi = np.radians(np.asarray(lat))
+    convergence = np.arctan(np.tan(deltaLon) * np.sin(phi))
+    scale = k0 / np.sqrt(1 - (np.cos(phi) * np.sin(deltaLon)) ** 2)
+    return convergence, scale
+
+
+def localEqualAreaProjString(lon0, lat0):
+    return f'+proj=laea +lat_0={lat0} +lon_0={lon0} +ellps=WGS84 +datum=WGS84 +units=m +no_defs'
+
+
+def extentCenter(bounds):  # (minx, miny, maxx, maxy) -> 范围中心 (lon0, lat0)
+    return (bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2
+
+
+def localEqualAreaTransformers(lon0, lat0):
+    """
+    以 (lon0, lat0) 为中心的兰伯特等积方位投影（LAEA）正/反向转换器，整个文件只用这一个投影。
+
+    面积没有变形；城市范围内（中心附近数十公里）长度和方向变形约 1e-5，远小于UTM的比例因子误差。
+    """
+    geo, laea = Proj(proj='latlong', datum='WGS84'), Proj(localEqualAreaProjString(lon0, lat0))
+    return Transformer.from_proj(geo, laea, always_xy=True), Transformer.from_proj(laea, geo, always_xy=True)
+
+
+def localGridCorrection(lon, lat, lon0, lat0):
+    """LAEA格网相对真北的子午线收敛角（弧度，与 utmGridCorrection 同号）和长度比例因子（等积投影取 sqrt(h*k)）"""
+    factors = Proj(localEqualAreaProjString(lon0, lat0)).get_factors(np.asarray(lon), np.asarray(lat))
+    convergence = np.radians(np.asarray(factors.meridian_convergence))
+    scale = np.sqrt(np.asarray(factors.meridional_scale) * np.asarray(factors.parallel_scale))
+    return convergence, scale
+
+
+def authalicLatitudeTerm(lat, e):  # 椭球面上赤道到纬度 lat 的带状面积（除去 b²Δλ/2 系数）
+    sinLat = np.sin(np.radians(lat))
+    return sinLat / (1 - (e * sinLat) ** 2) + np.log((1 + e * sinLat) / (1 - e * sinLat)) / (2 * e)
+
+
+@lru_cache(maxsize=64)
+def ellipsoidRowArea(minLat, maxLat, rows, cellWidth, a=6378137.0, f=1 / 298.257223563):
+    """
+    规则经纬网格每一行（纬度带）中单个网格的椭球面面积（WGS84，平方米），返回只读的 (rows,) 数组。
+
+    网格面积只与所在纬度带有关：A = b²·Δλ/2 · [q(φ2) - q(φ1)]；按 (纬度范围, 行数, 经度间隔) 缓存。
+    """
+    e = np.sqrt(f * (2 - f))
+    b = a * (1 - f)
+    q = authalicLatitudeTerm(np.linspace(minLat, maxLat, rows + 1), e)
+    area = b ** 2 * np.radians(cellWidth) / 2 * np.abs(np.diff(q))
+    area.setflags(write=False)
+    return area
+
+
+def gridCellArea(latList, lonList):
+    """规则经纬网格每个网格的椭球面面积 (ny, nx)：每个纬度带只算一次，再广播到各列（只读视图，不占额外内存）"""
+    cellWidth = (lonList[-1] - lonList[0]) / (len(lonList) - 1)
+    rowArea = ellipsoidRowArea(float(latList[0]), float(latList[-1]), len(latList) - 1, float(cellWidth))
+    return np.broadcast_to(rowArea.reshape(-1, 1), (len(latList) - 1, len(lonList) - 1))
+
+
+def metricGridCrs(crs, bounds):
+    """投影米制网格的坐标系：crs 为 None 时使用以文件范围中心为原点的LAEA（面积无变形，但不同文件的网格不对齐）"""
+    return crs if crs is not None else localEqualAreaProjString(*extentCenter(bounds))
+
+
+@lru_cache(maxsize=16)
+def metricTransformer(crs):  # 经纬度 -> 网格坐标系的转换器（按坐标系缓存，进程内复用）
+    return Transformer.from_crs('EPSG:4326', crs, always_xy=True)
+
+
+def projectPoints(points, crs):  # 经纬度点 (N, 2) 投影到网格坐标系 (N, 2)
+    x, y = metricTransformer(crs).transform(points[:, 0], points[:, 1])
+    return np.column_stack([x, y])
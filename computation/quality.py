@@ -0,0 +1,60 @@
+# coding=utf-8
+# 数据质量筛选：在列式数组上一次完成全部筛选，并按原因统计被剔除的建筑数量（写入运行日志和JSON汇总）
+
+import json
+
+import numpy as np
+
+# 剔除原因：缺少高度、高度低于阈值、缺少几何、空几何、非面类型、面积过小、面积过大
+rejectReasons = ('noHeight', 'lowHeight', 'noGeometry', 'emptyGeometry', 'otherType', 'smallArea', 'largeArea')
+
+
+def newRejected():
+    return dict.fromkeys(rejectReasons, 0)
+
+
+def mergeRejected(rejectedList):  # 多个分片/批次的剔除计数相加
+    merged = newRejected()
+    for rejected in rejectedList:
+        for reason in rejectReasons:
+            merged[reason] += int(rejected[reason])
+    return merged
+
+
+def rejectedToArray(rejected):  # 剔除计数 <-> 数组，用于写入缓存
+    return np.array([rejected[reason] for reason in rejectReasons], dtype='int64')
+
+
+def rejectedFromArray(array):
+    return dict(zip(rejectReasons, (int(count) for count in array)))
+
+
+def heightFilter(heights, minHeight, rejected=None):
+    """高度筛选：缺失值（NaN）记为 noHeight，低于 minHeight 记为 lowHeight，返回保留掩膜"""
+    noHeight = np.isnan(heights)
+    lowHeight = heights < minHeight  # NaN 比较结果为 False，不会重复计数
+    if rejected is not None:
+        rejected['noHeight'] += int(noHeight.sum())
+        rejected['lowHeight'] += int(lowHeight.sum())
+    return ~(noHeight | lowHeight)
+
+
+def areaFilter(area, minArea, maxArea, rejected=None):
+    """面积筛选：不大于 minArea 记为 smallArea，不小于 maxArea 记为 largeArea（误差记录），返回保留掩膜"""
+    smallArea = area <= minArea
+    largeArea = area >= maxArea
+    if rejected is not None:
+        rejected['smallArea'] += int(smallArea.sum())
+        rejected['largeArea'] += int(largeArea.sum())
+    return ~(smallArea | largeArea)
+
+
+def logRejected(name, kept, rejected):  # 运行日志：保留数量和各原因剔除数量
+    detail = ', '.join('{} {}'.format(reason, rejected[reason]) for reason in rejectReasons if rejected[reason])
+    print("{} 保留 {} 个建筑，剔除 {} 个（{}）".format(name, kept, sum(rejected.values()), detail or '无'))
+
+
+def writeQualitySummary(path, name, kept, rejected):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'name': name, 'kept': int(kept), 'rejected': rejected, 'totalRejected': sum(rejected.values())},
+                  f, ensure_ascii=False, indent=2)
@@ -0,0 +1,152 @@
+# coding=utf-8
+
+import os
+
+import fiona
+import numpy as np
+import shapely
+from tqdm import tqdm
+
+from computation.buildings import Buildings
+from computation.quality import heightFilter
+
+try:  # 可选：pyogrio + pyarrow 列式批量读取
+    from pyogrio import read_info
+    from pyogrio.raw import read_arrow
+except ImportError:
+    read_info = read_arrow = None
+
+bulkReadMaxBytes = 2 * 1024 ** 3  # 超过该大小的shp改用逐要素流式读取
+bulkReadBatchSize = 200000  # 批量读取时每批解码的要素数量
+shardMinFeatures = 200000  # 文件内分片时每个分片至少包含的要素数量，要素更少的文件不分片
+
+
+def ringsFromGeometries(geometries, heights, rejected=None):
+    """
+    将几何数组（Shapely 2）展开为扁平的外环顶点，MultiPolygon 的每个子多边形视为一个建筑。
+
+    参数:
+    rejected (dict): 剔除计数（见 computation.quality），空几何和非面类型计入其中。
+
+    返回:
+    Buildings: 顶点为经纬度（已去掉闭合点），只含高度属性。
+    """
+    parts, index = shapely.get_parts(geometries, return_index=True)
+    notEmpty = ~shapely.is_empty(parts)
+    parts, index = parts[notEmpty], index[notEmpty]
+    isPolygon = shapely.get_type_id(parts) == 3
+    if rejected is not None:
+        rejected['emptyGeometry'] += int((~notEmpty).sum())
+        rejected['otherType'] += int((~isPolygon).sum())
+    if not isPolygon.all():
+        for typeId in np.unique(shapely.get_type_id(parts[~isPolygon])):
+            print("未定义类型 {} ".format(shapely.GeometryType(typeId).name))
+        parts, index = parts[isPolygon], index[isPolygon]
+    rings = shapely.get_exterior_ring(parts)
+    coords = shapely.get_coordinates(rings)
+    # [1,2,3,4,5,1] 去掉每个环的最后一个点
+    ringEnd = np.cumsum(shapely.get_num_coordinates(rings))
+    keepVertex = np.ones(len(coords), dtype='bool')
+    keepVertex[ringEnd - 1] = False
+    offsets = np.zeros(len(rings) + 1, dtype='int64')
+    offsets[1:] = ringEnd - np.arange(1, len(rings) + 1)
+    return Buildings(coords[keepVertex], offsets, np.asarray(heights, dtype='float64')[index])
+
+
+def readFeatureInfo(shpFileDir):  # 要素数量和范围 (minx, miny, maxx, maxy)，不读取要素本身
+    if read_info is not None:
+        info = read_info(shpFileDir)
+        return info['features'], tuple(info['total_bounds'])
+    with fiona.open(shpFileDir, 'r') as shp:
+        return len(shp), shp.bounds
+
+
+def featureRanges(featureCount, workers):
+    """
+    按要素数量和可用进程数自动划分要素区间 [(start, stop), ...]。
+    每片至少 shardMinFeatures 个要素，片数不超过进程数；小文件只返回一个区间。
+    """
+    shardCount = int(max(1, min(workers, featureCount // shardMinFeatures)))
+    edges = np.linspace(0, featureCount, shardCount + 1).astype('int64')
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:])]
+
+
+def readRingsBulk(shpFileDir, heightField, minHeight, progress=None, featureRange=None, rejected=None):
+    """
+    列式批量读取：先只读取高度列完成高度筛选，再按连续的要素区间分批读取几何，只解码保留的要素。
+    （按要素序号 fids 读取会转为 OGRSQL 查询，shapefile 每次最多 4997 个序号，因此按区间读取后在内存中筛选）
+    """
+    start, stop = featureRange or (0, None)
+    _, table = read_arrow(shpFileDir, columns=[heightField], read_geometry=False, skip_features=start,
+                          max_features=None if stop is None else stop - start)
+    heights = table[heightField].to_numpy(zero_copy_only=False).astype('float64')
+    # 清除高度小于阈值的记录（缺失值视为无效），被剔除的要素不解码几何
+    keep = heightFilter(heights, minHeight, rejected)
+    chunks = []
+    for batch in range(0, len(keep), bulkReadBatchSize):
+        batchKeep = keep[batch:batch + bulkReadBatchSize]
+        if batchKeep.any():
+            meta, table = read_arrow(shpFileDir, columns=[], skip_features=start + batch, max_features=len(batchKeep))
+            wkb = table[meta['geometry_name'] or 'wkb_geometry'].to_numpy(zero_copy_only=False)[batchKeep]
+            geometries = shapely.from_wkb(wkb)
+            valid = ~shapely.is_missing(geometries)  # 清除缺少几何信息的记录
+            if rejected is not None:
+                rejected['noGeometry'] += int((~valid).sum())
+            batchHeights = heights[batch:batch + bulkReadBatchSize][batchKeep]
+            chunks.append(ringsFromGeometries(geometries[valid], batchHeights[valid], rejected))
+        if progress is not None:
+            progress.setValue(10 + int((batch + len(batchKeep)) / len(keep) * 40))
+    return Buildings.concat(chunks)
+
+
+def readRingsStream(shpFileDir, heightField, minHeight, progress=None, featureRange=None, rejected=None):
+    """
+    逐要素流式读取（fiona），顶点直接追加进预分配的扁平数组，用于超大文件或未安装 pyogrio 的环境。
+    """
+    name = shpFileDir.split("\\")[-1].split(".")[0]
+    n = 0
+    with fiona.open(shpFileDir, 'r', as_int=True) as shp:
+        start, stop = featureRange or (0, len(shp))
+        buildings = Buildings.allocate(max(stop - start, 1))
+        for feature in tqdm(shp.values(start, stop), total=stop - start, desc=name, position=0, leave=True):
+            if progress is not None and n % 100 == 0: progress.setValue(10 + int(n / (stop - start) * 40))
+            n += 1
+            geometry = feature['geometry']
+            height = feature['properties'][heightField]  # Height or pred_Heigh
+            if height is None or height < minHeight or geometry is None:  # 清除高度小于1的记录、缺少几何信息的记录
+                if rejected is not None:
+                    rejected['noHeight' if height is None else 'lowHeight' if height < minHeight else 'noGeometry'] += 1
+                continue
+
+            elif geometry['type'] == 'Polygon':
+                buildings.appendRing(np.asarray(geometry['coordinates'][0], dtype='float64')[:-1, :2], height)  # [1,2,3,4,5,1] 去掉最后一个点
+
+            elif geometry['type'] == 'MultiPolygon':
+                for single in geometry['coordinates']:
+                    # 每个子多边形视为一个建筑
+                    buildings.appendRing(np.asarray(single[0], dtype='float64')[:-1, :2], height)  # [1,2,3,4,5,1] 去掉最后一个点
+
+            else:
+                print("未定义类型 {} ".format(geometry['type']))
+                if rejected is not None:
+                    rejected['otherType'] += 1
+
+    return buildings.compact()
+
+
+def readBuildingRings(shpFileDir, heightField, minHeight, backend='auto', progress=None, featureRange=None,
+                      rejected=None):
+    """
+    读取建筑外环和高度，返回 Buildings（顶点为经纬度）。
+
+    参数:
+    backend (str): 'bulk' 列式批量读取（pyogrio/Arrow），'stream' 逐要素流式读取（fiona），
+                   'auto' 在已安装 pyogrio 且文件小于 bulkReadMaxBytes 时使用 'bulk'。
+    featureRange (tuple): 只读取要素序号在 [start, stop) 内的要素（文件内分片），默认读取全部。
+    rejected (dict): 传入时按原因累加读取阶段剔除的要素数量（见 computation.quality）。
+    """
+    if backend == 'auto':
+        backend = 'bulk' if read_arrow is not None and os.path.getsize(shpFileDir) < bulkReadMaxBytes else 'stream'
+    if backend == 'bulk':
+        return readRingsBulk(shpFileDir, heightField, minHeight, progress, featureRange, rejected)
+    return readRingsStream(shpFileDir, heightField, minHeight, progress, featureRange, rejected)
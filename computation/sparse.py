@@ -0,0 +1,82 @@
+# coding=utf-8
+# 稀疏网格统计：只保存有建筑的网格（按扁平序号排序的表），写出时逐窗口还原为稠密数组，
+# 内存随有建筑的网格数量增长，而不是随整度范围的外包矩形增长
+
+import numpy as np
+
+from computation.aggregate import aggregateCells, cellIndex, pieceCellIndex, sumNames
+
+windowRows = 256  # 逐窗口写出时每个窗口的行数
+
+
+def aggregateSparse(buildings, binY, binX, binZ, sums=sumNames, cell=None):
+    """
+    统计有建筑的网格，返回稀疏表 {'cells': (k,) 排序后的扁平网格序号, 名称: (..., k)}。
+    精确占地分摊时，只有跨网格建筑的一部分落入的网格也在表中（数量为 0）。
+    cell 为预先算好的网格序号（如投影米制网格），给出时按中心点统计。
+    """
+    if cell is None:
+        cell = cellIndex(buildings, binY, binX)
+        pieceCell = pieceCellIndex(buildings, binY, binX)
+    else:
+        pieceCell = None
+    occupied = cell if pieceCell is None else np.concatenate([cell, pieceCell])
+    cells = np.unique(occupied[occupied >= 0])
+
+    def localIndex(index):  # 网格序号 -> 稀疏表中的位置，范围外仍为 -1
+        local = np.full(len(index), -1, dtype='int64')
+        local[index >= 0] = np.searchsorted(cells, index[index >= 0])
+        return local
+
+    table = aggregateCells(buildings, localIndex(cell), len(cells), binZ, sums,
+                           None if pieceCell is None else localIndex(pieceCell))
+    table['cells'] = cells
+    return table
+
+
+def sumByCell(values, inverse, size):  # 按网格的新序号 inverse 相加 (..., k) -> (..., size)
+    rows = values.reshape(int(np.prod(values.shape[:-1])), values.shape[-1])  # 没有网格时 (..., 0) 也能展开
+    return np.stack([np.bincount(inverse, weights=row, minlength=size) for row in rows]) \
+        .reshape(values.shape[:-1] + (size,))
+
+
+def mergeSparse(tables):  # 多个分片的稀疏表按网格序号合并相加
+    cells, inverse = np.unique(np.concatenate([table['cells'] for table in tables]), return_inverse=True)
+    merged = {'cells': cells}
+    for name in tables[0]:
+        if name == 'cells':
+            continue
+        merged[name] = sumByCell(np.concatenate([table[name] for table in tables], axis=-1), inverse, len(cells))
+    return merged
+
+
+def coarsenSparse(table, nx, factor):
+    """稀疏表中相邻 factor×factor 个网格相加，得到粗一级分辨率的稀疏表（nx 为原分辨率的列数，须能被 factor 整除）"""
+    if factor == 1:
+        return table
+    iy, ix = np.divmod(table['cells'], nx)
+    cells, inverse = np.unique((iy // factor) * (nx // factor) + ix // factor, return_inverse=True)
+    coarse = {'cells': cells}
+    for name, values in table.items():
+        if name != 'cells':
+            coarse[name] = sumByCell(values, inverse, len(cells))
+    return coarse
+
+
+def denseWindow(table, nx, rowStart, rowStop):
+    """取出 [rowStart, rowStop) 行的网格，还原为稠密数组 {名称: (..., rows, nx)}，没有建筑的网格为 0"""
+    start, stop = np.searchsorted(table['cells'], [rowStart * nx, rowStop * nx])
+    local = table['cells'][start:stop] - rowStart * nx
+    size = (rowStop - rowStart) * nx
+    window = {}
+    for name, values in table.items():
+        if name == 'cells':
+            continue
+        dense = np.zeros(values.shape[:-1] + (size,))
+        dense[..., local] = values[..., start:stop]
+        window[name] = dense.reshape(values.shape[:-1] + (rowStop - rowStart, nx))
+    return window
+
+
+def iterWindows(ny):  # 按行分块的窗口 [(rowStart, rowStop), ...]
+    return [(rowStart, min(rowStart + windowRows, ny)) for rowStart in range(0, ny, windowRows)]
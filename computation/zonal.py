@@ -0,0 +1,154 @@
+# coding=utf-8
+# 分区统计：建筑中心点按多边形图层（街区、行政区等）归属到分区，用与网格相同的可相加统计量推导每个分区的UCP参数，
+# 结果写出为矢量表（每个分区一条记录，保留分区原有属性）。
+# 中心点归属由 STRtree 批量点面查询一次完成；多个建筑文件（分片）的统计量按分区相加即可合并。
+
+import csv
+import os
+from functools import lru_cache
+
+import fiona
+import numpy as np
+import shapely
+from pyproj import CRS, Transformer
+
+from computation.aggregate import bandNames, countIndicators
+from computation.projection import extentCenter, localEqualAreaProjString, metricTransformer
+
+try:  # 可选：pyogrio 批量读写（未安装时使用 fiona 逐要素读写）
+    from pyogrio.raw import read as readRaw, write as writeRaw
+except ImportError:
+    readRaw = writeRaw = None
+
+zoneQueryBatch = 1000000  # 每次查询的点数，限制查询结果占用的内存
+
+
+class Zones:
+    """分区图层：geometry 为经纬度几何数组（Shapely 2），fields 为原有属性 {字段: 数组}（保持字段顺序）"""
+
+    def __init__(self, geometry, fields):
+        self.geometry = geometry
+        self.fields = fields
+
+    def __len__(self):
+        return len(self.geometry)
+
+
+def toGeographic(geometry, crs):  # 几何数组从 crs 一次转换为经纬度（没有坐标系时视为经纬度）
+    if crs is None or CRS.from_user_input(crs).to_epsg() == 4326:
+        return geometry
+    transformer = Transformer.from_crs(crs, 'EPSG:4326', always_xy=True)
+    return shapely.transform(geometry, lambda coords: np.column_stack(transformer.transform(coords[:, 0],
+                                                                                           coords[:, 1])))
+
+
+@lru_cache(maxsize=4)
+def readZones(zoneFileDir):
+    """读取分区图层并转为经纬度，按路径缓存，进程池中每个子进程只读取一次"""
+    if readRaw is not None:
+        meta, _, wkb, fieldData = readRaw(zoneFileDir)
+        geometry = shapely.from_wkb(wkb)
+        fields = dict(zip(meta['fields'], fieldData))
+        crs = meta['crs']
+    else:
+        with fiona.open(zoneFileDir, 'r') as layer:
+            crs = layer.crs.to_wkt() if layer.crs else None
+            names = list(layer.schema['properties'])
+            records = list(layer)
+        geometry = np.array([None if record.geometry is None else shapely.geometry.shape(record.geometry)
+                             for record in records], dtype=object)
+        fields = {name: np.array([record.properties[name] for record in records]) for name in names}
+    return Zones(toGeographic(geometry, crs), fields)
+
+
+@lru_cache(maxsize=4)
+def zoneTree(zoneFileDir):  # 分区几何的空间索引（无效几何先修复）
+    geometry = readZones(zoneFileDir).geometry.copy()
+    invalid = ~shapely.is_valid(geometry) & ~shapely.is_missing(geometry)
+    geometry[invalid] = shapely.make_valid(geometry[invalid])
+    return shapely.STRtree(geometry)
+
+
+def assignZones(points, tree):
+    """
+    每个经纬度点 (N, 2) 所在分区的序号，不在任何分区内的点为 -1。
+    点落在相邻分区的公共边上或分区相互重叠时，归入序号最小的分区，保证每个建筑只计入一次。
+    """
+    zone = np.full(len(points), -1, dtype='int64')
+    for start in range(0, len(points), zoneQueryBatch):
+        pointIndex, zoneIndex = tree.query(shapely.points(points[start:start + zoneQueryBatch]), predicate='intersects')
+        order = np.lexsort((zoneIndex, pointIndex))
+        pointIndex, zoneIndex = pointIndex[order], zoneIndex[order]
+        first = np.unique(pointIndex, return_index=True)[1]
+        zone[start + pointIndex[first]] = zoneIndex[first]
+    return zone
+
+
+def zoneAreas(geometry):
+    """分区面积（平方米）：一次投影到以图层范围中心为原点的LAEA（等积投影）后计算"""
+    transformer = metricTransformer(localEqualAreaProjString(*extentCenter(shapely.total_bounds(geometry))))
+    projected = shapely.transform(geometry, lambda coords: np.column_stack(transformer.transform(coords[:, 0],
+                                                                                                 coords[:, 1])))
+    return shapely.area(projected)
+
+
+def zonalFields(zones, indicators, options, binZ, angles=()):
+    """
+    分区原有属性加上各参数列（列名与GeoTIFF文件名一致，dh 每个高度区间一列 dh_下界_上界，
+    λfN 每个风向一列 λfN_风向）
+    """
+    fields = dict(zones.fields)
+    for option in options:
+        value = indicators[option].astype('int64') if option in countIndicators or option == 'dh' else \
+            indicators[option]
+        names = bandNames(option, binZ, angles)
+        fields.update(zip(names, value.reshape(len(names), -1)))
+    return fields
+
+
+def fionaFieldType(values):
+    return {'i': 'int', 'u': 'int', 'f': 'float', 'b': 'bool'}.get(np.asarray(values).dtype.kind, 'str')
+
+
+def fionaValue(value):  # NumPy 标量转为 Python 类型，NaN（没有建筑的分区的比值）写为空值
+    value = value.item() if hasattr(value, 'item') else value
+    return None if isinstance(value, float) and np.isnan(value) else value
+
+
+def checkZonalPath(path):
+    """
+    分区统计结果的路径检查（在统计之前调用）：shapefile 的字段名最长 10 字节，λfN_337.5、dh_下界_上界 等列名
+    会被截断甚至重名，因此不支持 .shp，请使用 .gpkg（带分区几何）或 .csv（只写属性）。
+    """
+    if path.lower().endswith('.shp'):
+        raise ValueError('分区统计结果不支持 .shp（字段名最长 10 字节，参数列名会被截断），请使用 .gpkg 或 .csv：'
+                         '{}'.format(path))
+    return path
+
+
+def writeZonalTable(path, zones, indicators, options, binZ, angles=()):
+    """写出分区统计结果：.csv 只写属性，其他扩展名（.gpkg 等，不支持 .shp）带分区几何，格式由扩展名确定"""
+    checkZonalPath(path)
+    fields = zonalFields(zones, indicators, options, binZ, angles)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(fields))
+            writer.writerows(zip(*(values.tolist() for values in fields.values())))
+    elif writeRaw is not None:
+        writeRaw(path, shapely.to_wkb(zones.geometry), list(fields.values()), list(fields), crs='EPSG:4326',
+                 geometry_type='MultiPolygon', promote_to_multi=True)
+    else:
+        schema = {'geometry': 'MultiPolygon', 'properties': {name: fionaFieldType(values)
+                                                             for name, values in fields.items()}}
+        geometry = zones.geometry.copy()
+        polygon = shapely.get_type_id(geometry) == 3  # 与 MultiPolygon 图层类型一致
+        geometry[polygon] = shapely.multipolygons(geometry[polygon].reshape(-1, 1))
+        with fiona.open(path, 'w', schema=schema, crs='EPSG:4326', encoding='utf-8') as dst:
+            dst.writerecords({'geometry': shapely.geometry.mapping(geometry[i]),
+                              'properties': {name: fionaValue(values[i]) for name, values in fields.items()}}
+                             for i in range(len(zones)))
+    return path
@@ -37,6 +37,50 @@ def get_qgis_path():
         return 'G:/qgis/apps/qgis-ltr'
 
 
+def get_dh_config():
+    """获取高度分布（dh）的高度区间划分和是否输出累积分布"""
+    default_bins = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 400]
+    try:
+        computation = load_config().get('computation', {})
+    except Exception as e:
+        print(f"读取高度分布配置失败: {e}")
+        return default_bins, False
+    bins = computation.get('dh_bins', default_bins)
+    if not isinstance(bins, list) or len(bins) < 2 or not all(isinstance(z, (int, float)) for z in bins) or \
+            any(low >= high for low, high in zip(bins[:-1], bins[1:])):
+        raise ValueError(f"dh_bins 应为至少两个、严格递增的高度区间边界: {bins}")
+    return bins, bool(computation.get('dh_cumulative', False))
+
+
+def get_frontal_config():
+    """获取多风向峰向指数（λfN、风玫瑰加权λf）的风向（度）和各风向的频率（风玫瑰权重，None 为等权）"""
+    default_directions = [i * 22.5 for i in range(16)]
+    try:
+        computation = load_config().get('computation', {})
+    except Exception as e:
+        print(f"读取峰向指数风向配置失败: {e}")
+        return default_directions, None
+    directions = computation.get('frontal_directions', default_directions)
+    weights = computation.get('wind_rose_weights')
+    check_frontal_config(directions, weights)
+    return directions, weights
+
+
+def check_frontal_config(directions, weights):
+    """检查风向和风玫瑰权重，配置错误时在读取配置时报错（而不是在统计完成后推导参数时出错）"""
+    if not directions or not all(isinstance(angle, (int, float)) and 0 <= angle < 360 for angle in directions):
+        raise ValueError(f"frontal_directions 应为 [0, 360) 范围内的风向（度）列表: {directions}")
+    if len(set(directions)) != len(directions):
+        raise ValueError(f"frontal_directions 中有重复的风向: {directions}")
+    if weights is None:
+        return
+    if not isinstance(weights, list) or len(weights) != len(directions):
+        raise ValueError(f"wind_rose_weights 的个数（{len(weights) if isinstance(weights, list) else weights}）"
+                         f"应与 frontal_directions 的个数（{len(directions)}）相同")
+    if not all(isinstance(weight, (int, float)) and weight >= 0 for weight in weights) or sum(weights) <= 0:
+        raise ValueError(f"wind_rose_weights 应为非负数且总和大于 0: {weights}")
+
+
 def setup_env():
     """设置环境变量"""
     try:
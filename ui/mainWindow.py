@@ -153,6 +153,12 @@ class Ui_MainWindow(object):
         self.lf135.setChecked(True)
         self.lf135.setObjectName("lf135")
         self.verticalLayout_7.addWidget(self.lf135)
+        self.lfN = QtWidgets.QCheckBox(self.groupBox_7)
+        self.lfN.setObjectName("lfN")
+        self.verticalLayout_7.addWidget(self.lfN)
+        self.lfRose = QtWidgets.QCheckBox(self.groupBox_7)
+        self.lfRose.setObjectName("lfRose")
+        self.verticalLayout_7.addWidget(self.lfRose)
         self.verticalLayout_6.addWidget(self.groupBox_7)
         self.groupBox_5 = QtWidgets.QGroupBox(self.frame_2)
         self.groupBox_5.setObjectName("groupBox_5")
@@ -453,6 +459,8 @@ class Ui_MainWindow(object):
         self.lf45.setText(_translate("MainWindow", "λf45"))
         self.lf90.setText(_translate("MainWindow", "λf90"))
         self.lf135.setText(_translate("MainWindow", "λf135"))
+        self.lfN.setText(_translate("MainWindow", "λfN"))
+        self.lfRose.setText(_translate("MainWindow", "λfRose"))
         self.groupBox_5.setTitle(_translate("MainWindow", "2D指标"))
         self.pol.setText(_translate("MainWindow", "Proportion Of Landscape"))
         self.lpi.setText(_translate("MainWindow", "Largest Patch Index"))